@@ -0,0 +1,109 @@
+import queue
+import threading
+
+
+class SearchError(Exception):
+    """The engine raised during a background search; the engine's exception is the cause."""
+
+
+class AIWorker:
+    """Run engine searches in a background thread.
+
+    The search works on a copy of the board so the GUI can keep drawing the
+    live position. Finished results are handed back through a thread-safe
+    queue and picked up by poll() from the main loop. Every request gets a
+    generation number; cancel() bumps it, so results from an abandoned
+    search are dropped even if they arrive after the cancel.
+
+    on_result, if given, is called from the worker thread after a result has
+    been queued, so an event-driven main loop can wake up and poll().
+
+    A search started with ponder=True thinks on the opponent's time: it
+    runs without a time limit and poll() holds back its result until
+    ponderhit() turns it into the real search for the move.
+
+    An exception raised by the engine doesn't end the thread silently:
+    poll() raises it as a SearchError, so the caller can report it
+    instead of waiting forever.
+    """
+
+    def __init__(self, engine, on_result=None):
+        self.engine = engine
+        self.on_result = on_result
+        self.results = queue.Queue()
+        self.generation = 0
+        self.thread = None
+        self.stop_event = None
+        self.ponder_hit = None
+
+    @property
+    def busy(self):
+        """True while a search is running."""
+        return self.thread is not None and self.thread.is_alive()
+
+    @property
+    def pondering(self):
+        """True while a ponder search waits for ponderhit()."""
+        return self.ponder_hit is not None and not self.ponder_hit.is_set()
+
+    def start(self, board, ponder=False):
+        """Start searching a copy of board, cancelling any search in progress."""
+        self.cancel()
+        self.generation += 1
+        self.stop_event = threading.Event()
+        self.ponder_hit = threading.Event() if ponder else None
+        self.thread = threading.Thread(target=self._run,
+                                       args=(board.copy(), self.generation, self.stop_event,
+                                             self.ponder_hit),
+                                       name="ai-ponder" if ponder else "ai-search", daemon=True)
+        self.thread.start()
+
+    def _run(self, board, generation, stop_event, ponder_hit):
+        try:
+            if ponder_hit is None:
+                result = self.engine.search(board, stop_event=stop_event)
+            else:
+                result = self.engine.search(board, stop_event=stop_event, ponder_hit=ponder_hit)
+        except Exception as error:
+            result = SearchError(str(error) or type(error).__name__)
+            result.__cause__ = error
+        if not stop_event.is_set():
+            self.results.put((generation, result))
+            if self.on_result is not None:
+                self.on_result()
+
+    def ponderhit(self):
+        """The predicted move was played: let the ponder search finish as a normal one."""
+        self.ponder_hit.set()
+        if not self.busy and self.on_result is not None:
+            # It finished while pondering, so its result is already waiting
+            self.on_result()
+
+    def poll(self):
+        """Return the result of the current search if it has finished, else None.
+
+        Raises SearchError if the search failed.
+        """
+        if self.pondering:
+            return None
+        while True:
+            try:
+                generation, result = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if generation == self.generation:
+                if isinstance(result, SearchError):
+                    raise result
+                return result
+
+    def cancel(self):
+        """Stop the running search and discard its result."""
+        self.generation += 1
+        if self.stop_event is not None:
+            self.stop_event.set()
+        if self.thread is not None:
+            # The engine checks the stop event every few thousand nodes
+            self.thread.join()
+            self.thread = None
+        self.stop_event = None
+        self.ponder_hit = None
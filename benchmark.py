@@ -0,0 +1,258 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Render off-screen; must be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import chess
+import pygame
+
+import chess_gui
+from chess_engine import SearchEngine, evaluate
+
+# Constants
+BASELINE_PATH = 'benchmark_baseline.json'
+REGRESSION_THRESHOLD = 0.10  # Flag metrics more than 10% worse than the baseline
+ROUNDS = 3  # The suite runs this many times and keeps each metric's best value
+AI_NODE_LIMIT = 5000  # Fixed node budget, so ai_move work doesn't depend on the machine
+
+POSITIONS = {
+    "opening": chess.STARTING_FEN,
+    "middlegame": "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 9",
+    "endgame": "8/5pk1/6p1/3R4/1r6/6P1/5PK1/8 w - - 0 40",
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def new_game(fen):
+    # No book, tablebase or tuned weights, so results don't depend on files in the working directory
+    game = chess_gui.ChessGame(engine=SearchEngine(node_limit=AI_NODE_LIMIT, evaluate=evaluate),
+                               async_ai=False, ponder=False, book=False, tablebase=False,
+                               evaluate=evaluate)
+    game.log_moves = False
+    game.set_position(chess.Board(fen))
+    return game
+
+
+def highlight_squares(game):
+    """Two squares of the side to move whose pieces have legal moves."""
+    squares = sorted({move.from_square for move in game.board.legal_moves})
+    return squares[0], squares[-1]
+
+
+def bench_draw_board(fen, frames=300):
+    """Full and incremental draw_board() frame times with a selection and last move shown."""
+    game = new_game(fen)
+    board = game.board
+    game.last_move = board.peek() if board.move_stack else next(iter(board.legal_moves))
+    first, second = highlight_squares(game)
+    game.draw_board()
+
+    full = []
+    incremental = []
+    for i in range(frames):
+        # Alternate the selection so each frame has highlights to move
+        game.selected_square = first if i % 2 else second
+        game.valid_moves = game.get_valid_moves(game.selected_square)
+        start = time.perf_counter()
+        game.draw_board()
+        incremental.append(time.perf_counter() - start)
+
+        game.renderer.invalidate()
+        start = time.perf_counter()
+        game.draw_board()
+        full.append(time.perf_counter() - start)
+    return full, incremental
+
+
+def bench_moves(fen, repeats=200):
+    """Latency of get_valid_moves() on a fresh position and of make_move()."""
+    game = new_game(fen)
+    moves = [move for move in game.board.legal_moves if move.promotion in (None, chess.QUEEN)]
+    valid_times = []
+    make_times = []
+    for i in range(repeats):
+        move = moves[i % len(moves)]
+        # pop_move() dropped the cached index, so this pays for move generation
+        start = time.perf_counter()
+        game.get_valid_moves(move.from_square)
+        valid_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        game.make_move(move.from_square, move.to_square)
+        make_times.append(time.perf_counter() - start)
+        game.pop_move()
+        game.update_status()
+    return valid_times, make_times
+
+
+def bench_ai(fen, moves=6):
+    """Moves per second and nodes per second of ai_move() under a fixed node budget."""
+    game = new_game(fen)
+    nodes = 0
+    played = 0
+    start = time.perf_counter()
+    while played < moves and not game.game_over:
+        game.ai_color = game.board.turn
+        game.ai_move()
+        nodes += game.last_search.nodes
+        played += 1
+    elapsed = time.perf_counter() - start
+    return played / elapsed, nodes / elapsed
+
+
+def bench_startup(runs=5):
+    """Wall time to start Python, import chess_gui and draw the first frame."""
+    code = ("import chess_engine, chess_gui; chess_gui.init_display(); "
+            "chess_gui.ChessGame(async_ai=False, book=False, tablebase=False, "
+            "evaluate=chess_engine.evaluate).draw_board()")
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, env=os.environ,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def metric(value, unit, better="lower"):
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def run_round(quick=False):
+    """Run every benchmark once and return {name: metric}."""
+    scale = 4 if quick else 1
+    metrics = {}
+    for name, fen in POSITIONS.items():
+        full, incremental = bench_draw_board(fen, 300 // scale)
+        metrics[f"draw_board.{name}.full_p50"] = metric(1e3 * statistics.median(full), "ms")
+        metrics[f"draw_board.{name}.full_p95"] = metric(1e3 * percentile(full, 0.95), "ms")
+        metrics[f"draw_board.{name}.incremental_p50"] = metric(
+            1e3 * statistics.median(incremental), "ms")
+        metrics[f"draw_board.{name}.incremental_p95"] = metric(
+            1e3 * percentile(incremental, 0.95), "ms")
+
+        valid_times, make_times = bench_moves(fen, 400 // scale)
+        metrics[f"get_valid_moves.{name}_p50"] = metric(1e6 * statistics.median(valid_times), "us")
+        metrics[f"make_move.{name}_p50"] = metric(1e6 * statistics.median(make_times), "us")
+
+        moves_per_sec, nodes_per_sec = bench_ai(fen, 6 // (2 if quick else 1))
+        metrics[f"ai_move.{name}.moves_per_sec"] = metric(moves_per_sec, "moves/s", "higher")
+        metrics[f"ai_move.{name}.nodes_per_sec"] = metric(nodes_per_sec, "nodes/s", "higher")
+
+    startup = bench_startup(5 // (2 if quick else 1))
+    metrics["startup.cold_p50"] = metric(1e3 * statistics.median(startup), "ms")
+    return metrics
+
+
+def run_suite(quick=False, rounds=ROUNDS):
+    """Run the benchmarks and return {"meta": ..., "metrics": {name: metric}}.
+
+    Each metric keeps its best value over the rounds, like timeit's
+    minimum, so interference from other processes doesn't show up as a
+    regression.
+    """
+    chess_gui.init_display()
+    metrics = {}
+    for _ in range(rounds):
+        # As in timeit, keep garbage collection pauses out of the timings
+        gc.collect()
+        gc.disable()
+        try:
+            current = run_round(quick)
+        finally:
+            gc.enable()
+        for name, entry in current.items():
+            best = metrics.get(name)
+            if best is None or (entry["value"] > best["value"]
+                                if entry["better"] == "higher" else entry["value"] < best["value"]):
+                metrics[name] = entry
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "chess": chess.__version__,
+            "machine": platform.platform(),
+            "quick": quick,
+            "rounds": rounds,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Return (name, baseline, current, relative change, regressed) for shared metrics.
+
+    The change is signed so that positive means worse, whichever direction
+    the metric improves in.
+    """
+    rows = []
+    for name, base in baseline["metrics"].items():
+        if name not in current["metrics"]:
+            continue
+        old = base["value"]
+        new = current["metrics"][name]["value"]
+        if old == 0:
+            continue
+        change = (new - old) / old
+        if base["better"] == "higher":
+            change = -change
+        rows.append((name, old, new, change, change > threshold))
+    return rows
+
+
+def print_metrics(results):
+    for name, entry in results["metrics"].items():
+        print(f"  {name:42} {entry['value']:>14,.3f} {entry['unit']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rendering, move handling and the AI headlessly.")
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, metavar="PATH",
+                        help=f"store the results as a JSON baseline (default {BASELINE_PATH})")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, metavar="PATH",
+                        help="compare against a saved baseline; exit status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slowdown counted as a regression (default %(default)s)")
+    parser.add_argument("--rounds", type=int, default=ROUNDS,
+                        help="runs of the suite; each metric keeps its best (default %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, noisier numbers")
+    args = parser.parse_args()
+
+    results = run_suite(args.quick, args.rounds)
+    print_metrics(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, results, args.threshold)
+        regressions = [row for row in rows if row[4]]
+        print(f"\nCompared with {args.compare} ({baseline['meta']['date']}), "
+              f"threshold {args.threshold:.0%}, positive change = worse:")
+        for name, old, new, change, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(f"  {name:42} {old:>12,.3f} -> {new:>12,.3f} {change:+7.1%}  {flag}")
+        print(f"{len(regressions)} regression(s) in {len(rows)} metrics")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
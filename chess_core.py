@@ -0,0 +1,651 @@
+import collections
+import random
+import time
+from statistics import mean
+
+import chess
+import chess.polyglot
+from chess_engine import SearchEngine, SearchResult, load_default_evaluate
+from ai_worker import AIWorker, SearchError
+from opening_book import load_default_book
+from tablebase import load_default_tablebase
+
+# Constants
+AI_TIME_LIMIT = 1.0  # Hard per-move think time for the AI in seconds
+SNAPSHOT_INTERVAL = 16  # Plies between the board snapshots history navigation replays from
+
+def position_key(board):
+    """Key under which board counts towards repetitions.
+    
+    The Polyglot Zobrist hash covers pieces, side to move, castling rights
+    and the en passant square when a pawn can take there, which is what
+    makes two positions a repetition.
+    """
+    return chess.polyglot.zobrist_hash(board)
+
+class LegalMoveIndex:
+    """Legal moves of one position, generated once and grouped by origin square.
+    
+    For every from-square it maps destination squares to the move played by
+    a click on that pair, and records which of those moves capture or
+    promote. Promotions default to a queen, as they always have in the GUI.
+    """
+    
+    def __init__(self, board):
+        self.targets = {}  # from_square -> {to_square: move}
+        self.captures = {}  # from_square -> set of capturing to_squares
+        self.promotions = set()  # (from_square, to_square) pairs that promote
+        self.moves = set()  # Every legal move, including underpromotions
+        # Capture test on bitboards, cheaper than board.is_capture() per move
+        enemy = board.occupied_co[not board.turn]
+        if board.ep_square is not None:
+            enemy |= chess.BB_SQUARES[board.ep_square]
+        for move in board.legal_moves:
+            self.moves.add(move)
+            if move.promotion:
+                self.promotions.add((move.from_square, move.to_square))
+                if move.promotion != chess.QUEEN:
+                    continue
+            self.targets.setdefault(move.from_square, {})[move.to_square] = move
+            if enemy & chess.BB_SQUARES[move.to_square] and (
+                    move.to_square != board.ep_square or board.pawns & chess.BB_SQUARES[move.from_square]):
+                self.captures.setdefault(move.from_square, set()).add(move.to_square)
+    
+    def __contains__(self, move):
+        return move in self.moves
+    
+    def __len__(self):
+        return len(self.moves)
+    
+    def destinations(self, from_square):
+        """Return the squares the piece on from_square can move to."""
+        return list(self.targets.get(from_square, ()))
+    
+    def capture_targets(self, from_square):
+        """Return the destinations of from_square that capture a piece."""
+        return self.captures.get(from_square, set())
+    
+    def find(self, from_square, to_square):
+        """Return the legal move from from_square to to_square, or None."""
+        return self.targets.get(from_square, {}).get(to_square)
+    
+    def is_capture(self, from_square, to_square):
+        return to_square in self.captures.get(from_square, ())
+    
+    def is_promotion(self, from_square, to_square):
+        return (from_square, to_square) in self.promotions
+
+class PositionOutcome:
+    """Check, mobility and game-over state of one position, computed in one pass.
+    
+    Mobility is read from the position's LegalMoveIndex when one was
+    already built; otherwise generation stops at the first legal move,
+    which is all checkmate and stalemate need. Repetitions are read from
+    the game's running count of position keys instead of replaying the
+    move stack.
+    """
+    
+    def __init__(self, board, repetitions, move_index=None):
+        self.in_check = board.is_check()
+        if move_index is not None:
+            self.has_moves = len(move_index) > 0
+        else:
+            self.has_moves = any(board.generate_legal_moves())
+        self.repetitions = repetitions
+        self.checkmate = self.in_check and not self.has_moves
+        self.stalemate = not self.in_check and not self.has_moves
+        self.insufficient_material = board.is_insufficient_material()
+        self.threefold_repetition = repetitions >= 3
+        self.fifty_moves = board.halfmove_clock >= 100
+        self.game_over = (not self.has_moves or self.insufficient_material
+                          or self.threefold_repetition or self.fifty_moves)
+        if self.checkmate:
+            self.result = "0-1" if board.turn == chess.WHITE else "1-0"
+        elif self.game_over:
+            self.result = "1/2-1/2"
+        else:
+            self.result = "*"
+
+class ChessGameCore:
+    """Rules and state of a human vs AI game, with no pygame dependency.
+    
+    Holds the board, applies player and AI moves and tracks the status
+    message and game outcome. Importing this module does not touch pygame,
+    so scripts, tests and workers that only need the game logic start fast
+    and run without a display.
+    """
+    
+    # Print search statistics for every AI move; off for headless use, where
+    # last_search has the move's depth, nodes and nodes/s
+    log_moves = False
+    
+    def __init__(self, engine=None, async_ai=False, on_ai_result=None, book=None,
+                 tablebase=None, ponder=False, evaluate=None):
+        self.board = chess.Board()
+        self.player_color = chess.WHITE  # Player plays as white
+        self.ai_color = chess.BLACK      # AI plays as black
+        self.current_turn = chess.WHITE  # White starts
+        self.status_message = "White to move"
+        self.last_move = None
+        self.game_over = False
+        self.game_result = ""
+        self._move_index = None  # Built on demand, dropped on push/pop
+        self._outcome = None  # Same lifetime as the move index
+        # How often each position occurred in this game
+        self.position_key = position_key(self.board)
+        self.position_counts = collections.Counter([self.position_key])
+        # Every move of the game line, including moves taken back but not yet
+        # replaced, with board snapshots every SNAPSHOT_INTERVAL plies
+        self.history = []
+        self.ply = 0  # Moves of history played on the board
+        self.snapshots = {0: self.board.copy(stack=False)}
+        # Syzygy tables probed by the default engine; None loads the default
+        # directory if there is one, False disables probing
+        if tablebase is None:
+            tablebase = load_default_tablebase()
+        self.tablebase = tablebase or None
+        # Evaluation of the default engine; None uses the tuned weights if there are any
+        self.evaluate = evaluate
+        # Any object with a search(board) method returning a SearchResult
+        self.engine = engine if engine is not None else self.default_engine()
+        self.last_search = None
+        self.engine_error = None  # Why the last background search failed, if it did
+        # Opening book consulted before searching; None loads the default
+        # book if there is one, False disables it
+        if book is None:
+            book = load_default_book()
+        self.book = book or None
+        # Async mode searches in a worker thread so the caller's loop keeps running
+        self.async_ai = async_ai
+        self.ai_worker = AIWorker(self.engine, on_result=on_ai_result) if async_ai else None
+        # Pondering searches the expected reply on the player's time (async mode only)
+        self.ponder = ponder and async_ai
+        self.ponder_move = None  # Reply the running ponder search assumes
+        self.ponder_start = None
+        self.ponder_hit_time = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        # Seconds from asking for a move to playing it, for ponder hits and other searches
+        self.search_request_time = None
+        self.hit_latencies = []
+        self.search_latencies = []
+    
+    def default_engine(self):
+        """Built-in engine with the game's tablebase and evaluation."""
+        evaluate = self.evaluate if self.evaluate is not None else load_default_evaluate()
+        return SearchEngine(time_limit=AI_TIME_LIMIT, tablebase=self.tablebase, evaluate=evaluate)
+    
+    def reset(self):
+        """Start a new game, abandoning any AI search in progress."""
+        if self.ai_worker is not None:
+            self.ai_worker.cancel()
+        self.ponder_move = None
+        self.ponder_hit_time = None
+        self.search_request_time = None
+        self.board = chess.Board()
+        self._move_index = None
+        self._outcome = None
+        self.position_key = position_key(self.board)
+        self.position_counts = collections.Counter([self.position_key])
+        self.history = []
+        self.ply = 0
+        self.snapshots = {0: self.board.copy(stack=False)}
+        self.current_turn = chess.WHITE
+        self.status_message = "White to move"
+        self.last_move = None
+        self.game_over = False
+        self.game_result = ""
+        self.last_search = None
+        if self.current_turn == self.ai_color:
+            self.request_ai_move()
+    
+    def set_position(self, board):
+        """Replace the game with board (including its move stack), e.g. a loaded game."""
+        # The loaded moves become the history, snapshotted along the way
+        replay = board.root()
+        self.history = list(board.move_stack)
+        self.ply = len(self.history)
+        self.snapshots = {0: replay.copy(stack=False)}
+        for ply, move in enumerate(self.history, 1):
+            replay.push(move)
+            if ply % SNAPSHOT_INTERVAL == 0:
+                self.snapshots[ply] = self.snapshot(replay)
+        self.show_position(board)
+        if self.board.turn == self.ai_color and not self.game_over:
+            self.request_ai_move()
+    
+    def show_position(self, board):
+        """Make board, which must be at history ply self.ply, the current position.
+        
+        board keeps its whole move stack, so board.root() and
+        board.move_stack describe the game up to here.
+        """
+        if self.ai_worker is not None:
+            self.ai_worker.cancel()
+        self.ponder_move = None
+        self.ponder_hit_time = None
+        self.search_request_time = None
+        self.board = board
+        self._move_index = None
+        self._outcome = None
+        self.count_positions()
+        self.current_turn = board.turn
+        self.last_move = self.history[self.ply - 1] if self.ply else None
+        self.game_over = False
+        self.game_result = ""
+        self.last_search = None
+        self.update_status()
+    
+    def count_positions(self):
+        """Recount the positions since the last capture or pawn move, then keep it incremental.
+        
+        No earlier position can recur, so these are the only counts
+        repetition detection needs, and recounting replays at most the
+        moves of the fifty-move window rather than the whole game.
+        """
+        window = self.board.copy(stack=self.board.halfmove_clock)
+        replay = window.root()
+        self.position_counts = collections.Counter([position_key(replay)])
+        for move in window.move_stack:
+            replay.push(move)
+            self.position_counts[position_key(replay)] += 1
+        self.position_key = position_key(self.board)
+    
+    def snapshot(self, board):
+        """Copy board, with its move stack, for the snapshot table.
+        
+        A copy shares the per-ply state records of board's stack and only
+        duplicates the moves, so a snapshot costs a few bytes per ply and
+        copying one is far cheaper than replaying its moves.
+        """
+        return board.copy()
+    
+    def update_status(self):
+        """Set the status message and game outcome for the current position."""
+        outcome = self.outcome
+        
+        # Update status message
+        if self.board.turn == chess.WHITE:
+            self.status_message = "White to move"
+        else:
+            self.status_message = "Black to move"
+        
+        # Check for game over conditions
+        if outcome.checkmate:
+            winner = "Black" if self.board.turn == chess.WHITE else "White"
+            self.status_message = f"Checkmate! {winner} wins!"
+            self.game_result = f"{winner} wins by checkmate"
+        elif outcome.stalemate:
+            self.status_message = "Stalemate! Game drawn."
+            self.game_result = "Draw by stalemate"
+        elif outcome.insufficient_material:
+            self.status_message = "Insufficient material! Game drawn."
+            self.game_result = "Draw by insufficient material"
+        elif outcome.threefold_repetition:
+            self.status_message = "Threefold repetition! Game drawn."
+            self.game_result = "Draw by threefold repetition"
+        elif outcome.fifty_moves:
+            self.status_message = "Fifty-move rule! Game drawn."
+            self.game_result = "Draw by the fifty-move rule"
+        elif outcome.in_check:
+            self.status_message += " (Check!)"
+        self.game_over = outcome.game_over
+    
+    def shutdown(self):
+        """Stop background work before the game is discarded."""
+        if self.ai_worker is not None:
+            self.ai_worker.cancel()
+    
+    def get_piece_name(self, piece_char):
+        """Return the full name of a piece based on its character."""
+        names = {
+            'p': 'Pawn', 'r': 'Rook', 'n': 'Knight', 'b': 'Bishop', 'q': 'Queen', 'k': 'King',
+            'P': 'Pawn', 'R': 'Rook', 'N': 'Knight', 'B': 'Bishop', 'Q': 'Queen', 'K': 'King'
+        }
+        return names.get(piece_char, '')
+    
+    @property
+    def move_index(self):
+        """LegalMoveIndex of the current position, generated at most once."""
+        if self._move_index is None:
+            self._move_index = LegalMoveIndex(self.board)
+        return self._move_index
+    
+    @property
+    def outcome(self):
+        """PositionOutcome of the current position, computed at most once."""
+        if self._outcome is None:
+            self._outcome = PositionOutcome(self.board, self.position_counts[self.position_key],
+                                            self._move_index)
+        return self._outcome
+    
+    def push_move(self, move):
+        """Push a move and drop the now stale legal-move index and outcome.
+        
+        A move that differs from the history's next one replaces the rest
+        of the history.
+        """
+        self.board.push(move)
+        self.position_key = position_key(self.board)
+        self.position_counts[self.position_key] += 1
+        self._move_index = None
+        self._outcome = None
+        if self.ply < len(self.history) and self.history[self.ply] != move:
+            del self.history[self.ply:]
+            for ply in [ply for ply in self.snapshots if ply > self.ply]:
+                del self.snapshots[ply]
+        if self.ply == len(self.history):
+            self.history.append(move)
+        self.ply += 1
+        if self.ply % SNAPSHOT_INTERVAL == 0 and self.ply not in self.snapshots:
+            self.snapshots[self.ply] = self.snapshot(self.board)
+    
+    def pop_move(self):
+        """Take back the last move and drop the now stale legal-move index and outcome.
+        
+        The move stays in the history, so it can be redone. Taking back a
+        capture or pawn move leaves the repetition counts of the earlier
+        positions to count_positions().
+        """
+        self.position_counts[self.position_key] -= 1
+        move = self.board.pop()
+        self.position_key = position_key(self.board)
+        self._move_index = None
+        self._outcome = None
+        self.ply -= 1
+        return move
+    
+    def go_to_ply(self, ply):
+        """Show the position after ply moves of the history; returns True if it changed.
+        
+        The board is copied from the nearest snapshot at or before ply,
+        replaying fewer than SNAPSHOT_INTERVAL moves, unless stepping from
+        the current position is shorter. Seeking replays about as much
+        anywhere in a long game, and the board keeps the game's full move
+        stack. Any AI search is abandoned; the AI only moves again from
+        the end of the history.
+        """
+        ply = max(0, min(ply, len(self.history)))
+        if ply == self.ply:
+            return False
+        base = max(snapshot for snapshot in self.snapshots if snapshot <= ply)
+        
+        if abs(ply - self.ply) <= ply - base:
+            if self.ai_worker is not None:
+                self.ai_worker.cancel()
+            self.ponder_move = None
+            self.ponder_hit_time = None
+            self.search_request_time = None
+            recount = False
+            while self.ply > ply:
+                # Taking back a capture or pawn move reopens the previous window
+                recount = recount or self.board.halfmove_clock == 0
+                self.pop_move()
+            while self.ply < ply:
+                self.push_move(self.history[self.ply])
+            if recount:
+                self.count_positions()
+            self.current_turn = self.board.turn
+            self.last_move = self.history[ply - 1] if ply else None
+            self.last_search = None
+            self.update_status()
+        else:
+            board = self.snapshots[base].copy()
+            for move in self.history[base:ply]:
+                board.push(move)
+            self.ply = ply
+            self.show_position(board)
+        
+        if self.ply < len(self.history):
+            self.status_message += f" (move {self.ply} of {len(self.history)})"
+        elif self.board.turn == self.ai_color:
+            self.request_ai_move()
+        return True
+    
+    def step(self, plies):
+        """Move plies half-moves forward (or back, if negative) through the history."""
+        return self.go_to_ply(self.ply + plies)
+    
+    def undo(self):
+        """Take back moves up to the player's previous turn, usually the AI's reply and the player's move."""
+        ply = self.ply - 1
+        while ply > 0 and self.board_turn_at(ply) != self.player_color:
+            ply -= 1
+        return self.go_to_ply(ply)
+    
+    def redo(self):
+        """Replay taken-back moves up to the player's next turn, or the end of the history."""
+        ply = self.ply + 1
+        while ply < len(self.history) and self.board_turn_at(ply) != self.player_color:
+            ply += 1
+        return self.go_to_ply(ply)
+    
+    def board_turn_at(self, ply):
+        """Side to move after ply moves of the history."""
+        return self.snapshots[0].turn if ply % 2 == 0 else not self.snapshots[0].turn
+    
+    def get_valid_moves(self, square):
+        """Get all valid moves for the piece at the given square."""
+        return self.move_index.destinations(square)
+    
+    def make_move(self, from_square, to_square, promotion=None):
+        """Make a move on the board if it's valid.
+        
+        Promotions are to a queen unless promotion gives another piece type.
+        """
+        # The index already resolves promotions (to a queen) and legality
+        move = self.move_index.find(from_square, to_square)
+        if move is not None and promotion is not None and promotion != move.promotion:
+            move = chess.Move(from_square, to_square, promotion)
+            if move not in self.move_index:
+                move = None
+        
+        if move is not None:
+            self.push_move(move)
+            self.last_move = move
+            self.current_turn = not self.current_turn  # Switch turns
+            
+            self.update_status()
+            
+            if self.ponder_move is not None and (move != self.ponder_move or self.game_over):
+                if move != self.ponder_move:
+                    self.ponder_misses += 1
+                self.stop_ponder()
+            
+            return True
+        return False
+    
+    def ai_move(self):
+        """Search synchronously and make the engine's chosen move for the AI."""
+        if self.board.turn == self.ai_color and not self.game_over:
+            result = self.book_move()
+            if result is None:
+                result = self.engine.search(self.board)
+            return self.apply_ai_result(result)
+        return False
+    
+    def book_move(self):
+        """Return a SearchResult for an opening book move, or None when out of book."""
+        if self.book is None:
+            return None
+        start = time.perf_counter()
+        move = self.book.choose(self.board)
+        if move is None:
+            return None
+        return SearchResult(move, 0, 0, 0, time.perf_counter() - start, [move], source="book")
+    
+    def request_ai_move(self):
+        """Start the AI's turn in the background, or play it now in sync mode."""
+        if self.ai_worker is None:
+            return self.ai_move()
+        if self.board.turn == self.ai_color and not self.game_over:
+            if self.ponder_move is not None:
+                # The player made the predicted move, so keep the pondered search
+                self.ponder_hits += 1
+                self.ponder_hit_time = time.perf_counter()
+                self.ponder_move = None
+                self.ai_worker.ponderhit()
+                self.status_message = "Black is thinking..." if self.ai_color == chess.BLACK \
+                    else "White is thinking..."
+                return True
+            # Book lookups take microseconds, so play them without a search
+            result = self.book_move()
+            if result is not None:
+                return self.apply_ai_result(result)
+            self.search_request_time = time.perf_counter()
+            self.ai_worker.start(self.board)
+            self.status_message = "Black is thinking..." if self.ai_color == chess.BLACK \
+                else "White is thinking..."
+            return True
+        return False
+    
+    def update(self):
+        """Apply a finished background search. Call once per frame.
+        
+        Returns True if the AI moved.
+        """
+        if self.ai_worker is not None:
+            try:
+                result = self.ai_worker.poll()
+            except SearchError as error:
+                return self.engine_failed(error)
+            if result is not None and self.board.turn == self.ai_color and not self.game_over:
+                return self.apply_ai_result(result)
+        return False
+    
+    def engine_failed(self, error):
+        """Report a failed background search and retry the move with the built-in engine.
+        
+        A failure of the built-in engine itself is only reported, so the
+        status never keeps saying the AI is thinking.
+        """
+        self.engine_error = error
+        self.ponder_move = None
+        self.search_request_time = None
+        if self.log_moves:
+            print(f"AI search failed: {error}")
+        if isinstance(self.engine, SearchEngine):
+            self.status_message = f"AI search failed: {error}"
+            return False
+        self.engine = self.default_engine()
+        self.ai_worker.engine = self.engine
+        ply = self.ply
+        self.request_ai_move()
+        if self.ply != ply:
+            return True  # Answered from the book
+        self.status_message = f"AI engine failed ({error}), using the built-in engine"
+        return False
+    
+    @property
+    def ai_thinking(self):
+        """True while a background search for the AI's move is running."""
+        return (self.ai_worker is not None and self.ai_worker.busy
+                and not self.ai_worker.pondering)
+    
+    def start_ponder(self, result):
+        """Search the reply the AI expects, taken from its principal variation."""
+        if len(result.pv) < 2 or result.pv[0] != result.move or self.game_over:
+            return
+        expected = result.pv[1]
+        if expected not in self.move_index:
+            return
+        board = self.board.copy()
+        board.push(expected)
+        self.ponder_move = expected
+        self.ponder_start = time.perf_counter()
+        self.ai_worker.start(board, ponder=True)
+    
+    def stop_ponder(self):
+        """Abandon the ponder search, e.g. because the player deviated."""
+        self.ponder_move = None
+        self.ai_worker.cancel()
+    
+    def ponder_stats(self):
+        """Return ponder hits, misses, hit rate and response latencies as a dict.
+        
+        saved_seconds is the mean latency of unpondered searches minus that
+        of ponder hits, times the number of hits; None until both kinds of
+        move have been played.
+        """
+        total = self.ponder_hits + self.ponder_misses
+        hit_latency = mean(self.hit_latencies) if self.hit_latencies else None
+        search_latency = mean(self.search_latencies) if self.search_latencies else None
+        saved = None
+        if hit_latency is not None and search_latency is not None:
+            saved = round(len(self.hit_latencies) * (search_latency - hit_latency), 3)
+        return {
+            "hits": self.ponder_hits,
+            "misses": self.ponder_misses,
+            "hit_rate": self.ponder_hits / total if total else 0.0,
+            "hit_latency_ms": None if hit_latency is None else round(hit_latency * 1e3, 1),
+            "search_latency_ms": None if search_latency is None else round(search_latency * 1e3, 1),
+            "saved_seconds": saved,
+        }
+    
+    def apply_ai_result(self, result):
+        """Play the move from an engine SearchResult."""
+        self.last_search = result
+        move = result.move
+        if move is not None and move in self.move_index:
+            if self.ponder_hit_time is not None:
+                # The search ran from ponder_start; the player waited only since the hit
+                waited = time.perf_counter() - self.ponder_hit_time
+                self.hit_latencies.append(waited)
+                if self.log_moves:
+                    print(f"Ponder hit: answered in {waited * 1e3:.0f} ms after "
+                          f"{self.ponder_hit_time - self.ponder_start:.2f} s of pondering")
+                self.ponder_hit_time = None
+            elif self.search_request_time is not None and result.source == "search":
+                self.search_latencies.append(time.perf_counter() - self.search_request_time)
+            self.search_request_time = None
+            if self.log_moves and result.source == "book":
+                print(f"AI played {move.uci()} from the opening book "
+                      f"({result.elapsed * 1e6:.0f} us)")
+            elif self.log_moves and result.source == "tablebase":
+                print(f"AI played {move.uci()} from the tablebase "
+                      f"({result.elapsed * 1e3:.1f} ms)")
+            elif self.log_moves:
+                print(f"AI played {move.uci()}: depth {result.depth}, "
+                      f"{result.nodes} nodes, {result.nps} nps")
+            self.push_move(move)
+            self.last_move = move
+            self.current_turn = not self.current_turn  # Switch turns
+            
+            self.update_status()
+            
+            if self.ponder:
+                self.start_ponder(result)
+            
+            return True
+        return False
+
+def benchmark_outcome(plies=20000, seed=0):
+    """Time game-over detection per ply: the old is_*() cascade vs PositionOutcome.
+    
+    Both sides play random moves through push_move(), which also keeps the
+    repetition count; each ply then times the status update alone on the
+    same position. Returns microseconds per ply for each approach.
+    """
+    rng = random.Random(seed)
+    game = ChessGameCore(book=False, tablebase=False)
+    cascade_time = outcome_time = 0.0
+    for _ in range(plies):
+        if game.game_over:
+            game = ChessGameCore(book=False, tablebase=False)
+        game.push_move(rng.choice(list(game.board.legal_moves)))
+        board = game.board
+        
+        start = time.perf_counter()
+        board.is_checkmate() or board.is_stalemate() or board.is_insufficient_material() \
+            or board.is_check()
+        cascade_time += time.perf_counter() - start
+        
+        start = time.perf_counter()
+        game.update_status()
+        outcome_time += time.perf_counter() - start
+    return {"cascade_us": 1e6 * cascade_time / plies, "outcome_us": 1e6 * outcome_time / plies}
+
+if __name__ == "__main__":
+    results = benchmark_outcome()
+    print(f"is_*() cascade:   {results['cascade_us']:.1f} us/ply (no repetition or fifty-move detection)")
+    print(f"PositionOutcome:  {results['outcome_us']:.1f} us/ply")
@@ -0,0 +1,540 @@
+import chess
+import chess.polyglot
+import json
+import os
+import time
+
+# Search constants
+INFINITY = 1000000
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000  # Scores above this are mate scores
+MAX_PLY = 64
+TB_WIN_SCORE = 50000  # Tablebase wins score below mates but above any evaluation
+CHECK_INTERVAL = 1024  # Nodes between time/stop checks
+
+# Transposition table entry flags
+TT_EXACT = 0
+TT_LOWER = 1  # Fail-high: score is a lower bound
+TT_UPPER = 2  # Fail-low: score is an upper bound
+DEFAULT_TT_SIZE = 1 << 18  # Number of entries (must be a power of two)
+EVAL_WEIGHTS_PATH = 'eval_weights.json'  # Tuned weights from texel_tuning.py, used when present
+
+# Piece values in centipawns, indexed by chess.PAWN .. chess.KING
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 20000]
+
+# Piece-square tables from white's point of view, indexed by square (a1 = 0)
+PAWN_TABLE = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,   5,  10,  25,  25,  10,   5,   5,
+     10,  10,  20,  30,  30,  20,  10,  10,
+     50,  50,  50,  50,  50,  50,  50,  50,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+ROOK_TABLE = [
+      0,   0,   0,   5,   5,   0,   0,   0,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      5,  10,  10,  10,  10,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+QUEEN_TABLE = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+KING_TABLE = [
+     20,  30,  10,   0,   0,  10,  30,  20,
+     20,  20,   0,   0,   0,   0,  20,  20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+]
+PIECE_SQUARE_TABLES = [None, PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE,
+                       ROOK_TABLE, QUEEN_TABLE, KING_TABLE]
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget is exhausted."""
+
+
+class SearchResult:
+    """Outcome of a search: best move, score and throughput statistics.
+
+    source says where the move came from: "search", or e.g. "book" when it
+    was looked up instead of searched.
+    """
+
+    def __init__(self, move, score, depth, nodes, elapsed, pv, source="search"):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+        self.source = source
+
+    @property
+    def nps(self):
+        """Nodes searched per second."""
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def __repr__(self):
+        move = self.move.uci() if self.move else None
+        return (f"SearchResult(move={move}, score={self.score}, depth={self.depth}, "
+                f"nodes={self.nodes}, nps={self.nps})")
+
+
+class TranspositionTable:
+    """Fixed-size Zobrist-keyed hash table with depth-preferred replacement.
+
+    Entries live in parallel lists indexed by ``key & mask``. A new entry
+    replaces the resident one when the slot is empty, holds the same
+    position, was written during an older search, or was searched to a
+    depth no greater than the new one.
+    """
+
+    def __init__(self, size=DEFAULT_TT_SIZE):
+        if size & (size - 1):
+            raise ValueError("Transposition table size must be a power of two")
+        self.size = size
+        self.mask = size - 1
+        self.keys = [None] * size
+        self.depths = [0] * size
+        self.scores = [0] * size
+        self.flags = [TT_EXACT] * size
+        self.moves = [None] * size
+        self.ages = [0] * size
+        self.age = 0
+
+    def new_search(self):
+        """Age existing entries so they are replaced first."""
+        self.age += 1
+
+    def clear(self):
+        """Drop every entry."""
+        self.keys = [None] * self.size
+        self.moves = [None] * self.size
+
+    def probe(self, key):
+        """Return (depth, score, flag, move) for key, or None on a miss."""
+        index = key & self.mask
+        if self.keys[index] != key:
+            return None
+        return self.depths[index], self.scores[index], self.flags[index], self.moves[index]
+
+    def store(self, key, depth, score, flag, move):
+        """Store an entry, honouring the replacement policy."""
+        index = key & self.mask
+        resident = self.keys[index]
+        if (resident is None or resident == key or self.ages[index] != self.age
+                or depth >= self.depths[index]):
+            # Keep the old best move if the new entry has none
+            if move is None and resident == key:
+                move = self.moves[index]
+            self.keys[index] = key
+            self.depths[index] = depth
+            self.scores[index] = score
+            self.flags[index] = flag
+            self.moves[index] = move
+            self.ages[index] = self.age
+
+
+def evaluate(board):
+    """Static evaluation in centipawns from the side to move's point of view."""
+    score = 0
+    for piece_type in range(chess.PAWN, chess.KING + 1):
+        value = PIECE_VALUES[piece_type]
+        table = PIECE_SQUARE_TABLES[piece_type]
+        for square in board.pieces(piece_type, chess.WHITE):
+            score += value + table[square]
+        for square in board.pieces(piece_type, chess.BLACK):
+            score -= value + table[chess.square_mirror(square)]
+    return score if board.turn == chess.WHITE else -score
+
+
+def weighted_evaluate(weights):
+    """Return an evaluate(board) function for a table of per-square piece values.
+
+    weights has six rows of 64 values, pawn to king, from white's point
+    of view with the material value included, as texel_tuning.py writes
+    them. Black's values are the mirrored squares of the same rows.
+    """
+    white = [list(row) for row in weights]
+    black = [[row[chess.square_mirror(square)] for square in chess.SQUARES] for row in white]
+
+    def evaluate(board):
+        score = 0
+        for piece_type in range(chess.PAWN, chess.KING + 1):
+            values = white[piece_type - 1]
+            for square in chess.scan_forward(board.pieces_mask(piece_type, chess.WHITE)):
+                score += values[square]
+            values = black[piece_type - 1]
+            for square in chess.scan_forward(board.pieces_mask(piece_type, chess.BLACK)):
+                score -= values[square]
+        return score if board.turn == chess.WHITE else -score
+    return evaluate
+
+
+def load_weights(path):
+    """Read a weights file written by texel_tuning.py and return its evaluate(board)."""
+    with open(path) as f:
+        weights = json.load(f)["weights"]
+    if len(weights) != 6 or any(len(row) != 64 for row in weights):
+        raise ValueError(f"{path} does not hold 6 x 64 evaluation weights")
+    return weighted_evaluate(weights)
+
+
+def load_default_evaluate():
+    """Return the evaluation for the tuned weights at EVAL_WEIGHTS_PATH, or evaluate() if there are none."""
+    if os.path.exists(EVAL_WEIGHTS_PATH):
+        return load_weights(EVAL_WEIGHTS_PATH)
+    return evaluate
+
+
+class SearchEngine:
+    """Iterative deepening alpha-beta search with a transposition table.
+
+    Moves are ordered TT move first, then captures by MVV-LVA, then killer
+    moves and finally by history score. Leaf nodes are resolved with a
+    capture-only quiescence search. The search always answers within the
+    configured time or node budget with the best move of the deepest
+    completed iteration.
+    """
+
+    def __init__(self, time_limit=1.0, node_limit=None, max_depth=MAX_PLY,
+                 tt_size=DEFAULT_TT_SIZE, evaluate=evaluate, tablebase=None, tt=None, start_depth=1):
+        self.time_limit = time_limit
+        self.tablebase = tablebase  # Optional tablebase.Tablebase for endgames
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        # Any table with the TranspositionTable methods, e.g. one shared between processes
+        self.tt = tt if tt is not None else TranspositionTable(tt_size)
+        self.start_depth = start_depth  # Depth of the first iteration; Lazy SMP helpers start deeper
+        self.evaluate = evaluate
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.stop_event = None
+        self.ponder_hit = None
+        self.search_start = 0.0
+        self.search_time_limit = None
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+        self.seen = {}
+        self.root_best = None
+
+    def new_game(self):
+        """Forget everything learned from previous positions."""
+        self.tt.clear()
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+
+    def search(self, board, time_limit=None, node_limit=None, max_depth=None,
+               stop_event=None, ponder_hit=None):
+        """Search board and return a SearchResult for the side to move.
+
+        Setting stop_event (a threading.Event) from another thread aborts the
+        search at the next budget check, as if the time limit had expired.
+
+        Passing ponder_hit (a threading.Event) makes this a ponder search:
+        it ignores the time limit until the event is set, then stops once
+        the time limit has passed since the search started, so a search
+        that has pondered long enough answers at once.
+        """
+        time_limit = self.time_limit if time_limit is None else time_limit
+        node_limit = self.node_limit if node_limit is None else node_limit
+        max_depth = self.max_depth if max_depth is None else max_depth
+
+        start = time.perf_counter()
+        self.search_start = start
+        self.search_time_limit = time_limit
+        self.deadline = start + time_limit if time_limit else None
+        self.max_nodes = node_limit
+        self.stop_event = stop_event
+        self.ponder_hit = ponder_hit
+        if ponder_hit is not None:
+            self.deadline = None  # Set by check_budget() on the ponder hit
+        self.nodes = 0
+        self.tt.new_search()
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        for side in self.history:
+            for row in side:
+                for i in range(64):
+                    row[i] >>= 1
+        board = board.copy()
+        self.seen = self.position_history(board)
+
+        legal_moves = list(board.legal_moves)
+        if not legal_moves:
+            return SearchResult(None, 0, 0, 0, 0.0, [])
+
+        # Perfect play is available from the tablebase, so don't search
+        if self.tablebase is not None and self.tablebase.covers(board):
+            move, wdl = self.tablebase.best_move(board)
+            if move is not None:
+                return SearchResult(move, self.tablebase_score(wdl, 0), 0, 0,
+                                    time.perf_counter() - start, [move], source="tablebase")
+
+        best = SearchResult(legal_moves[0], 0, 0, 0, 0.0, [legal_moves[0]])
+        for depth in range(min(self.start_depth, max_depth), max_depth + 1):
+            self.root_best = None
+            try:
+                score = self.alpha_beta(board, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                # Use the partial iteration only if it searched the previous best first
+                if self.root_best is not None and self.root_best[0] == best.move:
+                    best.score = max(best.score, self.root_best[1])
+                break
+            move = self.root_move(board)
+            if move is not None:
+                best = SearchResult(move, score, depth, self.nodes, 0.0,
+                                    self.principal_variation(board, depth))
+            # No point searching deeper once a forced mate is found
+            if abs(score) >= MATE_THRESHOLD or len(legal_moves) == 1:
+                break
+
+        best.nodes = self.nodes
+        best.elapsed = time.perf_counter() - start
+        return best
+
+    def position_history(self, board):
+        """Count Zobrist keys of the game so far for repetition detection."""
+        seen = {}
+        replay = board.copy()
+        keys = [chess.polyglot.zobrist_hash(replay)]
+        while replay.move_stack:
+            replay.pop()
+            keys.append(chess.polyglot.zobrist_hash(replay))
+        for key in keys:
+            seen[key] = seen.get(key, 0) + 1
+        return seen
+
+    def root_move(self, board):
+        entry = self.tt.probe(chess.polyglot.zobrist_hash(board))
+        if entry is not None and entry[3] is not None:
+            return entry[3]
+        return self.root_best[0] if self.root_best else None
+
+    def principal_variation(self, board, depth):
+        """Follow TT best moves from the root to build the principal variation."""
+        pv = []
+        replay = board.copy(stack=False)
+        for _ in range(depth):
+            entry = self.tt.probe(chess.polyglot.zobrist_hash(replay))
+            if entry is None or entry[3] is None or not replay.is_legal(entry[3]):
+                break
+            pv.append(entry[3])
+            replay.push(entry[3])
+        return pv
+
+    def check_budget(self):
+        if self.ponder_hit is not None and self.ponder_hit.is_set():
+            # The predicted move was played: the clock has been running since the start
+            self.ponder_hit = None
+            if self.search_time_limit:
+                self.deadline = self.search_start + self.search_time_limit
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+
+    def order_moves(self, board, moves, tt_move, ply):
+        """Sort moves best-first for alpha-beta cutoffs."""
+        killers = self.killers[ply] if ply <= MAX_PLY else (None, None)
+        history = self.history[board.turn]
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = 10000000
+            elif board.is_capture(move):
+                victim = board.piece_type_at(move.to_square) or chess.PAWN  # En passant
+                attacker = board.piece_type_at(move.from_square)
+                score = 1000000 + 10 * PIECE_VALUES[victim] - attacker
+            elif move.promotion:
+                score = 900000 + PIECE_VALUES[move.promotion]
+            elif move == killers[0]:
+                score = 800000
+            elif move == killers[1]:
+                score = 700000
+            else:
+                score = history[move.from_square][move.to_square]
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def alpha_beta(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_budget()
+
+        key = chess.polyglot.zobrist_hash(board)
+        if ply > 0:
+            # Repetition and fifty-move draws
+            if self.seen.get(key, 0) > 0 or board.halfmove_clock >= 100:
+                return 0
+            # Endgame positions in the tablebase have an exact value
+            if self.tablebase is not None and self.tablebase.covers(board):
+                wdl = self.tablebase.probe_wdl(board, key)
+                if wdl is not None:
+                    return self.tablebase_score(wdl, ply)
+            # Mate distance pruning
+            alpha = max(alpha, -MATE_SCORE + ply)
+            beta = min(beta, MATE_SCORE - ply - 1)
+            if alpha >= beta:
+                return alpha
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1  # Check extension
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(board, alpha, beta, ply)
+
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if ply > 0 and tt_depth >= depth:
+                tt_score = self.score_from_tt(tt_score, ply)
+                if tt_flag == TT_EXACT:
+                    return tt_score
+                if tt_flag == TT_LOWER and tt_score >= beta:
+                    return tt_score
+                if tt_flag == TT_UPPER and tt_score <= alpha:
+                    return tt_score
+
+        moves = list(board.legal_moves)
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        self.seen[key] = self.seen.get(key, 0) + 1
+        try:
+            for move in self.order_moves(board, moves, tt_move, ply):
+                is_quiet = not board.is_capture(move) and not move.promotion
+                board.push(move)
+                try:
+                    score = -self.alpha_beta(board, depth - 1, -beta, -alpha, ply + 1)
+                finally:
+                    board.pop()
+
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                    if ply == 0:
+                        self.root_best = (move, score)
+                if score > alpha:
+                    alpha = score
+                if alpha >= beta:
+                    if is_quiet:
+                        killers = self.killers[ply]
+                        if killers[0] != move:
+                            killers[1] = killers[0]
+                            killers[0] = move
+                        self.history[board.turn][move.from_square][move.to_square] += depth * depth
+                    break
+        finally:
+            self.seen[key] -= 1
+
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self.tt.store(key, depth, self.score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def quiescence(self, board, alpha, beta, ply):
+        """Search captures only until the position is quiet."""
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_budget()
+
+        in_check = board.is_check()
+        if not in_check:
+            stand_pat = self.evaluate(board)
+            if stand_pat >= beta or ply >= MAX_PLY:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            moves = list(board.generate_legal_captures())
+        else:
+            # Search every evasion when in check so mates are not missed
+            moves = list(board.legal_moves)
+            if not moves:
+                return -MATE_SCORE + ply
+            if ply >= MAX_PLY:
+                return self.evaluate(board)
+
+        for move in self.order_moves(board, moves, None, MAX_PLY):
+            board.push(move)
+            try:
+                score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def tablebase_score(self, wdl, ply):
+        """Convert a WDL value to a score; cursed wins and blessed losses are draws."""
+        if wdl == 2:
+            return TB_WIN_SCORE - ply
+        if wdl == -2:
+            return -TB_WIN_SCORE + ply
+        return 0
+
+    def score_to_tt(self, score, ply):
+        """Store mate scores relative to the node rather than the root."""
+        if score >= MATE_THRESHOLD:
+            return score + ply
+        if score <= -MATE_THRESHOLD:
+            return score - ply
+        return score
+
+    def score_from_tt(self, score, ply):
+        if score >= MATE_THRESHOLD:
+            return score - ply
+        if score <= -MATE_THRESHOLD:
+            return score + ply
+        return score
@@ -1,19 +1,39 @@
 import pygame
 import chess
-import random
 import os
 import math
-
-# Initialize pygame
-pygame.init()
+import json
+import time
+import argparse
+import threading
+import collections
+from chess_core import ChessGameCore
+from perf_trace import TraceRecorder, NullRecorder, FrameStats
 
 # Constants
 WIDTH, HEIGHT = 600, 600  # Reduced from 800x800 to 600x600
 BOARD_SIZE = 8
 SQUARE_SIZE = WIDTH // BOARD_SIZE
-PIECE_SIZE = SQUARE_SIZE - 12  # Adjusted for smaller board
+PIECE_SIZE = SQUARE_SIZE - SQUARE_SIZE // 6  # piece_size_for(SQUARE_SIZE)
 FONT_SIZE = 14
 BORDER_SIZE = 25  # Slightly smaller border
+RENDER_ON_DEMAND = True  # Sleep while idle and redraw only when something changed
+IDLE_TIMEOUT_MS = 500  # Longest the idle loop sleeps waiting for an event
+RESIZABLE_WINDOW = True  # Let the window be resized; the board is laid out again to fit
+RESIZE_DEBOUNCE_MS = 120  # Relayout once resize events have stopped for this long
+MIN_SQUARE_SIZE = 24
+STATUS_BAR_HEIGHT = 60
+LAYER_CACHE_SIZE = 4  # Board layers kept for recently used window sizes
+SPRITE_CACHE_SIZE = 4  # Scaled piece sets kept for recently used piece sizes
+PIECES_DIR = 'pieces'
+ATLAS_MANIFEST = 'atlas.json'  # Written by generate_pieces.py
+PONDER = False  # Let the AI think about its next move while the player thinks (uses a full core)
+SHOW_HUD = False  # Start with the performance overlay shown (toggle with F3)
+HUD_COLOR = (160, 200, 160)
+AI_TRACE_TID = 2  # Trace row for AI searches, which finish on the worker thread
+
+# Posted by the AI worker thread when a search result is ready
+AI_MOVE_READY = pygame.USEREVENT + 1
 
 # Colors
 WHITE = (255, 255, 255)
@@ -26,188 +46,384 @@ BORDER_COLOR = (62, 39, 35)  # Dark brown for border
 TEXT_COLOR = (230, 230, 230)  # Off-white for text
 BACKGROUND_COLOR = (40, 40, 40)  # Dark gray for background
 
-# Set up the display with border
+# Display size with border
 screen_width = WIDTH + 2 * BORDER_SIZE
-screen_height = HEIGHT + 2 * BORDER_SIZE + 60  # Extra space for status bar
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Chess")
+screen_height = HEIGHT + 2 * BORDER_SIZE + STATUS_BAR_HEIGHT  # Extra space for status bar
 
-# Load fonts
-try:
-    font = pygame.font.Font(None, FONT_SIZE)
-    title_font = pygame.font.Font(None, 28)
-    coordinate_font = pygame.font.Font(None, 20)
-except:
-    font = pygame.font.SysFont('Arial', FONT_SIZE)
-    title_font = pygame.font.SysFont('Arial', 28)
-    coordinate_font = pygame.font.SysFont('Arial', 20)
+# Display and fonts are created lazily by init_display()
+screen = None
+font = None
+title_font = None
+coordinate_font = None
 
-class ChessGame:
-    def __init__(self):
-        self.board = chess.Board()
-        self.selected_square = None
-        self.valid_moves = []
-        self.piece_images = {}
-        self.load_piece_images()
-        self.player_color = chess.WHITE  # Player plays as white
-        self.ai_color = chess.BLACK      # AI plays as black
-        self.current_turn = chess.WHITE  # White starts
-        self.status_message = "White to move"
-        self.last_move = None
-        self.game_over = False
-        self.game_result = ""
-        
-    def load_piece_images(self):
-        """Load chess piece images or create colored shapes if images not available."""
-        piece_chars = ['p', 'r', 'n', 'b', 'q', 'k', 'P', 'R', 'N', 'B', 'Q', 'K']
-        
-        # Try to load images from the pieces directory
-        for piece in piece_chars:
-            image_path = os.path.join('pieces', f'{piece}.png')
-            try:
-                if os.path.exists(image_path):
-                    img = pygame.image.load(image_path)
-                    self.piece_images[piece] = pygame.transform.scale(img, (PIECE_SIZE, PIECE_SIZE))
-                else:
-                    # Create a placeholder surface if image doesn't exist
-                    self.piece_images[piece] = self.create_placeholder_piece(piece)
-            except pygame.error:
-                self.piece_images[piece] = self.create_placeholder_piece(piece)
+def init_display():
+    """Initialize pygame, open the window and load fonts on first use."""
+    global screen, font, title_font, coordinate_font
+    if screen is not None:
+        return screen
     
-    def create_placeholder_piece(self, piece):
-        """Create a placeholder piece when images are not available."""
-        surface = pygame.Surface((PIECE_SIZE, PIECE_SIZE), pygame.SRCALPHA)
-        
-        # Determine piece color
-        is_white = piece.isupper()
-        piece_color = WHITE if is_white else BLACK
-        bg_color = (200, 200, 200) if is_white else (100, 100, 100)
-        
-        # Draw a circle as the base
-        pygame.draw.circle(surface, bg_color, (PIECE_SIZE//2, PIECE_SIZE//2), PIECE_SIZE//2)
-        pygame.draw.circle(surface, piece_color, (PIECE_SIZE//2, PIECE_SIZE//2), PIECE_SIZE//2 - 2)
-        
-        # Add the piece letter
-        text = font.render(piece.upper(), True, BLACK if is_white else WHITE)
-        text_rect = text.get_rect(center=(PIECE_SIZE//2, PIECE_SIZE//2))
-        surface.blit(text, text_rect)
-        
-        return surface
+    pygame.init()
+    screen = pygame.display.set_mode((screen_width, screen_height),
+                                     pygame.RESIZABLE if RESIZABLE_WINDOW else 0)
+    pygame.display.set_caption("Chess")
+    
+    # Load fonts
+    try:
+        font = pygame.font.Font(None, FONT_SIZE)
+        title_font = pygame.font.Font(None, 28)
+        coordinate_font = pygame.font.Font(None, 20)
+    except:
+        font = pygame.font.SysFont('Arial', FONT_SIZE)
+        title_font = pygame.font.SysFont('Arial', 28)
+        coordinate_font = pygame.font.SysFont('Arial', 20)
+    return screen
+
+LAST_MOVE_HIGHLIGHT = (255, 255, 0, 60)  # Very light yellow for the last move
+CAPTURE_RING = (255, 0, 0)  # Red ring around capturable pieces
+
+def post_ai_move_ready():
+    """Wake up the main loop when the AI worker has a result."""
+    pygame.event.post(pygame.event.Event(AI_MOVE_READY))
+
+def piece_size_for(square_size):
+    """Size of the piece sprites drawn on squares of square_size pixels.
+    
+    generate_pieces.py builds its atlases at the sizes this gives for
+    common board sizes, so those boards need no scaling at runtime.
+    """
+    return square_size - square_size // 6
+
+class BoardLayout:
+    """Pixel geometry of the board for one window size.
     
-    def get_piece_name(self, piece_char):
-        """Return the full name of a piece based on its character."""
-        names = {
-            'p': 'Pawn', 'r': 'Rook', 'n': 'Knight', 'b': 'Bishop', 'q': 'Queen', 'k': 'King',
-            'P': 'Pawn', 'R': 'Rook', 'N': 'Knight', 'B': 'Bishop', 'Q': 'Queen', 'K': 'King'
-        }
-        return names.get(piece_char, '')
+    The board is the largest multiple of 8 pixels that fits the window
+    with the border and status bar, centered horizontally. At the default
+    window size this gives the original WIDTH, SQUARE_SIZE and PIECE_SIZE.
+    """
     
-    def draw_board(self):
-        """Draw the chess board with pieces and coordinates."""
-        # Fill background
-        screen.fill(BACKGROUND_COLOR)
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        board = min(width - 2 * BORDER_SIZE, height - 2 * BORDER_SIZE - STATUS_BAR_HEIGHT)
+        self.square_size = max(MIN_SQUARE_SIZE, board // BOARD_SIZE)
+        self.board_size = self.square_size * BOARD_SIZE
+        self.piece_size = piece_size_for(self.square_size)
+        self.left = max(BORDER_SIZE, (width - self.board_size) // 2)
+        self.top = BORDER_SIZE
+    
+    def square_rect(self, row, col):
+        return pygame.Rect(self.left + col * self.square_size, self.top + row * self.square_size,
+                           self.square_size, self.square_size)
+
+class LRUCache:
+    """Bounded cache of values built on demand, dropping the least recently used.
+    
+    Used for surfaces that depend only on a size, so a resize back to a
+    recent size costs a lookup and memory stays bounded however many
+    sizes the window passes through.
+    """
+    
+    def __init__(self, build, max_entries):
+        self.build = build
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        value = self.build(key)
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+    
+    def clear(self):
+        self.entries.clear()
+
+class BoardRenderer:
+    """Retained-mode board renderer.
+
+    Background, border, squares, coordinates and title are drawn once into a
+    cached static layer. Each frame only the squares whose piece or
+    highlights changed are restored from that layer and redrawn, using a
+    small pool of pre-filled overlay surfaces, and the list of changed
+    rectangles is returned for pygame.display.update().
+    
+    The static layer and overlays of each window size come from an LRU
+    cache, so resizing back and forth rebuilds nothing.
+    """
+    
+    def __init__(self, surface, layout):
+        self.layer_cache = LRUCache(self.build_layers, LAYER_CACHE_SIZE)
+        self.set_layout(surface, layout)
+    
+    def set_layout(self, surface, layout):
+        """Switch to a new window surface and board geometry."""
+        self.surface = surface
+        self.layout = layout
+        self.static_layer, self.overlays = self.layer_cache.get((layout.width, layout.height))
+        self.square_rects = [layout.square_rect(row, col)
+                             for row in range(BOARD_SIZE) for col in range(BOARD_SIZE)]
+        self.status_rect = pygame.Rect(0, layout.top + layout.board_size + 20, layout.width, 25)
+        self.hud_rect = pygame.Rect(0, self.status_rect.bottom, layout.width,
+                                    max(0, layout.height - self.status_rect.bottom))
+        self.invalidate()
+    
+    def build_layers(self, size):
+        """Build the static layer and overlay pool for a window size."""
+        layout = BoardLayout(*size)
+        # Overlay pool, filled once and reused every frame
+        overlays = {}
+        for name, color in (('selected', HIGHLIGHT), ('move', MOVE_HIGHLIGHT),
+                            ('last', LAST_MOVE_HIGHLIGHT)):
+            overlay = pygame.Surface((layout.square_size, layout.square_size), pygame.SRCALPHA)
+            overlay.fill(color)
+            overlays[name] = overlay
+        return self.build_static_layer(layout), overlays
+    
+    def build_static_layer(self, layout):
+        """Pre-render everything that never changes during a game."""
+        square_size = layout.square_size
+        layer = pygame.Surface((layout.width, layout.height)).convert()
+        layer.fill(BACKGROUND_COLOR)
         
         # Draw board border
-        pygame.draw.rect(screen, BORDER_COLOR, 
-                         (BORDER_SIZE - 5, BORDER_SIZE - 5, 
-                          WIDTH + 10, HEIGHT + 10), 5)
+        pygame.draw.rect(layer, BORDER_COLOR, 
+                         (layout.left - 5, layout.top - 5, 
+                          layout.board_size + 10, layout.board_size + 10), 5)
         
         # Draw the squares
         for row in range(BOARD_SIZE):
             for col in range(BOARD_SIZE):
                 color = LIGHT_SQUARE if (row + col) % 2 == 0 else DARK_SQUARE
-                
-                # Draw the square
-                pygame.draw.rect(screen, color, 
-                                (col * SQUARE_SIZE + BORDER_SIZE, 
-                                 row * SQUARE_SIZE + BORDER_SIZE, 
-                                 SQUARE_SIZE, SQUARE_SIZE))
-                
-                # Highlight selected square
-                if self.selected_square is not None and row * BOARD_SIZE + col == self.selected_square:
-                    highlight_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-                    highlight_surface.fill(HIGHLIGHT)
-                    screen.blit(highlight_surface, 
-                               (col * SQUARE_SIZE + BORDER_SIZE, 
-                                row * SQUARE_SIZE + BORDER_SIZE))
-                
-                # Highlight valid moves
-                if row * BOARD_SIZE + col in self.valid_moves:
-                    move_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-                    move_surface.fill(MOVE_HIGHLIGHT)
-                    screen.blit(move_surface, 
-                               (col * SQUARE_SIZE + BORDER_SIZE, 
-                                row * SQUARE_SIZE + BORDER_SIZE))
-                    
-                    # Draw a circle for empty squares or a ring for captures
-                    piece = self.board.piece_at(row * BOARD_SIZE + col)
-                    if piece is None:
-                        # Draw a dot for empty square moves
-                        pygame.draw.circle(screen, DARK_SQUARE if (row + col) % 2 == 0 else LIGHT_SQUARE,
-                                          (col * SQUARE_SIZE + BORDER_SIZE + SQUARE_SIZE // 2,
-                                           row * SQUARE_SIZE + BORDER_SIZE + SQUARE_SIZE // 2),
-                                          SQUARE_SIZE // 8)
-                    else:
-                        # Draw a ring for captures
-                        pygame.draw.circle(screen, (255, 0, 0, 180),
-                                          (col * SQUARE_SIZE + BORDER_SIZE + SQUARE_SIZE // 2,
-                                           row * SQUARE_SIZE + BORDER_SIZE + SQUARE_SIZE // 2),
-                                          SQUARE_SIZE // 2 - 5, 2)
-                
-                # Highlight last move
-                if self.last_move:
-                    from_square = self.last_move.from_square
-                    to_square = self.last_move.to_square
-                    
-                    from_row, from_col = self.square_to_coords(from_square)
-                    to_row, to_col = self.square_to_coords(to_square)
-                    
-                    if row == from_row and col == from_col or row == to_row and col == to_col:
-                        last_move_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-                        last_move_surface.fill((255, 255, 0, 60))  # Very light yellow
-                        screen.blit(last_move_surface, 
-                                   (col * SQUARE_SIZE + BORDER_SIZE, 
-                                    row * SQUARE_SIZE + BORDER_SIZE))
-        
-        # Draw the pieces
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
-                square = row * BOARD_SIZE + col
-                piece = self.board.piece_at(square)
-                
-                if piece:
-                    piece_char = piece.symbol()
-                    piece_img = self.piece_images.get(piece_char)
-                    
-                    if piece_img:
-                        # Center the piece in the square
-                        x = col * SQUARE_SIZE + BORDER_SIZE + (SQUARE_SIZE - PIECE_SIZE) // 2
-                        y = row * SQUARE_SIZE + BORDER_SIZE + (SQUARE_SIZE - PIECE_SIZE) // 2
-                        screen.blit(piece_img, (x, y))
+                pygame.draw.rect(layer, color, layout.square_rect(row, col))
         
         # Draw coordinates
         for i in range(BOARD_SIZE):
             # Draw file labels (a-h)
             file_label = chr(97 + i)  # ASCII 'a' is 97
             text = coordinate_font.render(file_label, True, TEXT_COLOR)
-            screen.blit(text, (BORDER_SIZE + i * SQUARE_SIZE + SQUARE_SIZE // 2 - text.get_width() // 2, 
-                              HEIGHT + BORDER_SIZE + 5))
+            layer.blit(text, (layout.left + i * square_size + square_size // 2 - text.get_width() // 2, 
+                             layout.top + layout.board_size + 5))
             
             # Draw rank labels (1-8)
             rank_label = str(8 - i)
             text = coordinate_font.render(rank_label, True, TEXT_COLOR)
-            screen.blit(text, (BORDER_SIZE - 15, 
-                              BORDER_SIZE + i * SQUARE_SIZE + SQUARE_SIZE // 2 - text.get_height() // 2))
-        
-        # Draw status bar
-        status_rect = pygame.Rect(BORDER_SIZE, HEIGHT + BORDER_SIZE + 20, WIDTH, 25)
-        status_text = title_font.render(self.status_message, True, TEXT_COLOR)
-        screen.blit(status_text, (status_rect.centerx - status_text.get_width() // 2, 
-                                 status_rect.centery - status_text.get_height() // 2))
+            layer.blit(text, (layout.left - 15, 
+                             layout.top + i * square_size + square_size // 2 - text.get_height() // 2))
         
         # Draw game title
         title_text = title_font.render("Chess", True, TEXT_COLOR)
-        screen.blit(title_text, (screen_width // 2 - title_text.get_width() // 2, 8))
+        layer.blit(title_text, (layout.width // 2 - title_text.get_width() // 2, 8))
+        return layer
+    
+    def invalidate(self):
+        """Force a full redraw on the next frame (e.g. after the window was exposed)."""
+        self.full_redraw = True
+        self.square_states = [None] * (BOARD_SIZE * BOARD_SIZE)
+        self.status_message = None
+    
+    def render(self, game):
+        """Redraw what changed since the last frame and return the dirty rects."""
+        dirty_rects = []
+        if self.full_redraw:
+            self.surface.blit(self.static_layer, (0, 0))
+            dirty_rects.append(self.surface.get_rect())
+            self.full_redraw = False
+        
+        board = game.board
+        piece_map = board.piece_map()
+        valid_moves = set(game.valid_moves)
+        capture_targets = ()
+        if game.selected_square is not None:
+            capture_targets = game.move_index.capture_targets(game.selected_square)
+        last_squares = ()
+        if game.last_move:
+            last_squares = (game.last_move.from_square, game.last_move.to_square)
+        
+        for square, rect in enumerate(self.square_rects):
+            piece = piece_map.get(square)
+            state = (piece.symbol() if piece else None,
+                     square == game.selected_square,
+                     square in valid_moves,
+                     square in capture_targets,
+                     square in last_squares)
+            if state == self.square_states[square]:
+                continue
+            self.square_states[square] = state
+            self.draw_square(game, square, rect, state)
+            dirty_rects.append(rect)
+        
+        if game.status_message != self.status_message:
+            self.status_message = game.status_message
+            self.surface.blit(self.static_layer, self.status_rect, self.status_rect)
+            status_text = title_font.render(self.status_message, True, TEXT_COLOR)
+            self.surface.blit(status_text, (self.layout.left + self.layout.board_size // 2
+                                            - status_text.get_width() // 2, 
+                                            self.status_rect.centery - status_text.get_height() // 2))
+            dirty_rects.append(self.status_rect)
+        return dirty_rects
+    
+    def draw_hud(self, lines):
+        """Draw text lines in the performance overlay, or clear it if lines is None."""
+        self.surface.blit(self.static_layer, self.hud_rect, self.hud_rect)
+        y = self.hud_rect.y + 2
+        for line in lines or ():
+            text = font.render(line, True, HUD_COLOR)
+            self.surface.blit(text, (self.layout.left, y))
+            y += text.get_height() + 2
+        return self.hud_rect
+    
+    def draw_square(self, game, square, rect, state):
+        """Restore one square from the static layer and draw its overlays and piece."""
+        piece_char, selected, valid_move, capture, last_move = state
+        row, col = game.square_to_coords(square)
+        self.surface.blit(self.static_layer, rect, rect)
+        
+        # Highlight selected square
+        if selected:
+            self.surface.blit(self.overlays['selected'], rect)
+        
+        # Highlight valid moves
+        if valid_move:
+            self.surface.blit(self.overlays['move'], rect)
+            
+            # Draw a circle for empty squares or a ring for captures
+            if not capture:
+                pygame.draw.circle(self.surface, DARK_SQUARE if (row + col) % 2 == 0 else LIGHT_SQUARE,
+                                   rect.center, rect.width // 8)
+            else:
+                pygame.draw.circle(self.surface, CAPTURE_RING, rect.center, rect.width // 2 - 5, 2)
+        
+        # Highlight last move
+        if last_move:
+            self.surface.blit(self.overlays['last'], rect)
+        
+        # Draw the piece centered in the square
+        if piece_char:
+            piece_img = game.piece_images.get(piece_char)
+            if piece_img:
+                self.surface.blit(piece_img, piece_img.get_rect(center=rect.center))
+
+class ChessGame(ChessGameCore):
+    """Pygame front end on top of the headless game core.
+    
+    Nothing touches the display until the first draw_board() call, which
+    opens the window, loads the fonts and piece images and builds the
+    renderer.
+    """
+    
+    log_moves = True  # The console shows what the AI thought about each move
+    
+    def __init__(self, engine=None, async_ai=True, ponder=PONDER, book=None, tablebase=None,
+                 evaluate=None):
+        super().__init__(engine, async_ai, on_ai_result=post_ai_move_ready if async_ai else None,
+                         book=book, tablebase=tablebase, ponder=ponder, evaluate=evaluate)
+        self.selected_square = None
+        self.valid_moves = []
+        self.hover_square = None
+        self.layout = BoardLayout(screen_width, screen_height)
+        self.piece_images = {}  # Loaded on first draw
+        self.renderer = None  # Created on first draw
+        self.atlas_manifest = None  # Read from pieces/atlas.json on first draw
+        self.atlases = {}  # Atlas size -> loaded atlas surface
+        self.sprite_cache = LRUCache(self.load_piece_images, SPRITE_CACHE_SIZE)
+    
+    def reset(self):
+        """Start a new game, clearing the selection as well as the board."""
+        self.selected_square = None
+        self.valid_moves = []
+        self.hover_square = None
+        super().reset()
+    
+    def set_position(self, board):
+        """Show a new position, clearing the selection."""
+        self.selected_square = None
+        self.valid_moves = []
+        self.hover_square = None
+        super().set_position(board)
+    
+    def go_to_ply(self, ply):
+        """Show a position from the history, clearing the selection."""
+        self.selected_square = None
+        self.valid_moves = []
+        return super().go_to_ply(ply)
+        
+    def load_piece_images(self, size=PIECE_SIZE):
+        """Return piece images of the given size, sliced from a sprite atlas.
+        
+        The atlas for the nearest size at or above size is loaded once and
+        each piece is a subsurface sharing its pixels; pieces are only
+        scaled when no atlas has that exact size. Without a usable atlas the
+        pieces are placeholders.
+        """
+        piece_chars = ['p', 'r', 'n', 'b', 'q', 'k', 'P', 'R', 'N', 'B', 'Q', 'K']
+        images = {}
+        
+        try:
+            if self.atlas_manifest is None:
+                with open(os.path.join(PIECES_DIR, ATLAS_MANIFEST)) as f:
+                    self.atlas_manifest = json.load(f)["atlases"]
+            sizes = sorted(int(atlas_size) for atlas_size in self.atlas_manifest)
+            atlas_size = next((atlas_size for atlas_size in sizes if atlas_size >= size), sizes[-1])
+            entry = self.atlas_manifest[str(atlas_size)]
+            atlas = self.atlases.get(atlas_size)
+            if atlas is None:
+                atlas = pygame.image.load(os.path.join(PIECES_DIR, entry["image"]))
+                if pygame.display.get_surface() is not None:
+                    atlas = atlas.convert_alpha()
+                self.atlases[atlas_size] = atlas
+            for piece in piece_chars:
+                image = atlas.subsurface(entry["pieces"][piece])
+                if atlas_size != size:
+                    image = pygame.transform.smoothscale(image, (size, size))
+                images[piece] = image
+        except (OSError, ValueError, KeyError, IndexError, pygame.error):
+            # No usable atlas: run generate_pieces.py to build one
+            for piece in piece_chars:
+                images[piece] = self.create_placeholder_piece(piece, size)
+        return images
+    
+    def create_placeholder_piece(self, piece, size=PIECE_SIZE):
+        """Create a placeholder piece when images are not available."""
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        
+        # Determine piece color
+        is_white = piece.isupper()
+        piece_color = WHITE if is_white else BLACK
+        bg_color = (200, 200, 200) if is_white else (100, 100, 100)
+        
+        # Draw a circle as the base
+        pygame.draw.circle(surface, bg_color, (size//2, size//2), size//2)
+        pygame.draw.circle(surface, piece_color, (size//2, size//2), size//2 - 2)
+        
+        # Add the piece letter
+        text = font.render(piece.upper(), True, BLACK if is_white else WHITE)
+        text_rect = text.get_rect(center=(size//2, size//2))
+        surface.blit(text, text_rect)
+        
+        return surface
+    
+    def draw_board(self):
+        """Draw the parts of the board that changed and return their rects."""
+        if self.renderer is None:
+            surface = init_display()
+            self.layout = BoardLayout(*surface.get_size())
+            self.renderer = BoardRenderer(surface, self.layout)
+            self.piece_images = self.sprite_cache.get(self.layout.piece_size)
+        return self.renderer.render(self)
+    
+    def resize(self, width, height):
+        """Lay the board out again for a new window size."""
+        self.layout = BoardLayout(width, height)
+        if self.renderer is not None:
+            self.renderer.set_layout(pygame.display.get_surface(), self.layout)
+            self.piece_images = self.sprite_cache.get(self.layout.piece_size)
     
     def square_to_coords(self, square):
         """Convert a chess.square (0-63) to board coordinates (row, col)."""
@@ -220,105 +436,16 @@ class ChessGame:
     def get_square_from_pos(self, pos):
         """Convert screen position to board square."""
         x, y = pos
-        x -= BORDER_SIZE
-        y -= BORDER_SIZE
+        x -= self.layout.left
+        y -= self.layout.top
         
-        if x < 0 or y < 0 or x >= WIDTH or y >= HEIGHT:
+        if x < 0 or y < 0 or x >= self.layout.board_size or y >= self.layout.board_size:
             return None
             
-        col = x // SQUARE_SIZE
-        row = y // SQUARE_SIZE
+        col = x // self.layout.square_size
+        row = y // self.layout.square_size
         return self.coords_to_square(row, col)
     
-    def get_valid_moves(self, square):
-        """Get all valid moves for the piece at the given square."""
-        valid_moves = []
-        piece = self.board.piece_at(square)
-        
-        if piece and piece.color == self.board.turn:
-            for move in self.board.legal_moves:
-                if move.from_square == square:
-                    valid_moves.append(move.to_square)
-        
-        return valid_moves
-    
-    def make_move(self, from_square, to_square):
-        """Make a move on the board if it's valid."""
-        move = chess.Move(from_square, to_square)
-        
-        # Check for promotion
-        if self.board.piece_at(from_square) and self.board.piece_at(from_square).piece_type == chess.PAWN:
-            if (to_square < 8 and self.board.piece_at(from_square).color == chess.BLACK) or \
-               (to_square >= 56 and self.board.piece_at(from_square).color == chess.WHITE):
-                move = chess.Move(from_square, to_square, promotion=chess.QUEEN)
-        
-        if move in self.board.legal_moves:
-            self.board.push(move)
-            self.last_move = move
-            self.current_turn = not self.current_turn  # Switch turns
-            
-            # Update status message
-            if self.board.turn == chess.WHITE:
-                self.status_message = "White to move"
-            else:
-                self.status_message = "Black to move"
-            
-            # Check for game over conditions
-            if self.board.is_checkmate():
-                winner = "Black" if self.board.turn == chess.WHITE else "White"
-                self.status_message = f"Checkmate! {winner} wins!"
-                self.game_over = True
-                self.game_result = f"{winner} wins by checkmate"
-            elif self.board.is_stalemate():
-                self.status_message = "Stalemate! Game drawn."
-                self.game_over = True
-                self.game_result = "Draw by stalemate"
-            elif self.board.is_insufficient_material():
-                self.status_message = "Insufficient material! Game drawn."
-                self.game_over = True
-                self.game_result = "Draw by insufficient material"
-            elif self.board.is_check():
-                self.status_message += " (Check!)"
-            
-            return True
-        return False
-    
-    def ai_move(self):
-        """Make a random valid move for the AI."""
-        if self.board.turn == self.ai_color and not self.game_over:
-            legal_moves = list(self.board.legal_moves)
-            if legal_moves:
-                move = random.choice(legal_moves)
-                self.board.push(move)
-                self.last_move = move
-                self.current_turn = not self.current_turn  # Switch turns
-                
-                # Update status message
-                if self.board.turn == chess.WHITE:
-                    self.status_message = "White to move"
-                else:
-                    self.status_message = "Black to move"
-                
-                # Check for game over conditions
-                if self.board.is_checkmate():
-                    winner = "Black" if self.board.turn == chess.WHITE else "White"
-                    self.status_message = f"Checkmate! {winner} wins!"
-                    self.game_over = True
-                    self.game_result = f"{winner} wins by checkmate"
-                elif self.board.is_stalemate():
-                    self.status_message = "Stalemate! Game drawn."
-                    self.game_over = True
-                    self.game_result = "Draw by stalemate"
-                elif self.board.is_insufficient_material():
-                    self.status_message = "Insufficient material! Game drawn."
-                    self.game_over = True
-                    self.game_result = "Draw by insufficient material"
-                elif self.board.is_check():
-                    self.status_message += " (Check!)"
-                
-                return True
-        return False
-    
     def handle_click(self, pos):
         """Handle mouse click on the board."""
         square = self.get_square_from_pos(pos)
@@ -339,8 +466,11 @@ class ChessGame:
                 self.valid_moves = []
                 
                 # After player's move, make AI move
-                pygame.time.delay(500)  # Small delay before AI moves
-                self.ai_move()
+                if self.async_ai:
+                    self.request_ai_move()
+                else:
+                    pygame.time.delay(500)  # Small delay before AI moves
+                    self.ai_move()
             else:
                 # If the clicked square has a piece of the player's color, select it
                 piece = self.board.piece_at(square)
@@ -359,8 +489,14 @@ class ChessGame:
                 self.valid_moves = self.get_valid_moves(square)
     
     def draw_piece_info(self, pos):
-        """Draw information about the piece at the given position."""
+        """Draw information about the piece at the given position.
+        
+        Returns True if the status message changed.
+        """
         square = self.get_square_from_pos(pos)
+        if square == self.hover_square:
+            return False
+        self.hover_square = square
         if square is not None:
             piece = self.board.piece_at(square)
             if piece:
@@ -370,34 +506,192 @@ class ChessGame:
                 info_text = f"{color} {piece_name}"
                 
                 # Update status message with piece info
-                self.status_message = info_text
+                if info_text != self.status_message:
+                    self.status_message = info_text
+                    return True
+        return False
+
+def hud_lines(game, frames):
+    """Text of the performance overlay: frame times, FPS and the last AI move."""
+    lines = [f"Frame p50 {frames.percentile(0.5) * 1e3:.2f} ms, "
+             f"p95 {frames.percentile(0.95) * 1e3:.2f} ms, "
+             f"p99 {frames.percentile(0.99) * 1e3:.2f} ms, {frames.fps()} fps"]
+    result = game.last_search
+    if game.ai_thinking:
+        lines.append("AI thinking...")
+    elif result is not None and result.source == "search":
+        lines.append(f"AI {result.elapsed:.2f} s, depth {result.depth}, "
+                     f"{result.nodes:,} nodes, {result.nps:,} nodes/s")
+    elif result is not None:
+        lines.append(f"AI {result.elapsed * 1e3:.1f} ms ({result.source})")
+    return lines
 
-def main():
-    game = ChessGame()
+def main(on_demand=RENDER_ON_DEMAND, trace_path=None, show_hud=SHOW_HUD, engine=None, ponder=PONDER):
+    init_display()
+    game = ChessGame(engine=engine, ponder=ponder)
     running = True
     clock = pygame.time.Clock()
+    redraw = True
+    
+    # Phase timers: recorded to a Chrome trace only when one was requested
+    tracer = TraceRecorder() if trace_path else NullRecorder()
+    tracer.name_thread(threading.get_ident(), "main loop")
+    tracer.name_thread(AI_TRACE_TID, "AI search")
+    frames = FrameStats()
+    traced_search = None
+    hud_shown = False
+    
+    # Block every event type, then allow only those the loop handles, so the rest don't wake it up
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN,
+                              pygame.MOUSEMOTION, pygame.VIDEOEXPOSE, pygame.WINDOWRESTORED,
+                              pygame.VIDEORESIZE, AI_MOVE_READY])
+    resize_pending = None  # Latest window size while resize events keep coming
+    resize_due = 0
     
     # If AI starts (playing as white), make the first move
     if game.current_turn == game.ai_color:
-        game.ai_move()
+        game.request_ai_move()
     
     while running:
-        for event in pygame.event.get():
+        if on_demand and not redraw:
+            # Sleep until something happens instead of spinning at the frame rate
+            timeout = IDLE_TIMEOUT_MS
+            if resize_pending is not None:
+                timeout = max(1, resize_due - pygame.time.get_ticks())
+            events = [pygame.event.wait(timeout)] + pygame.event.get()
+        else:
+            events = pygame.event.get()
+        frame_start = time.perf_counter()
+        
+        motion_pos = None
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_r:  # Start a new game
+                    game.reset()
+                    redraw = True
+                elif event.key == pygame.K_F3:  # Toggle the performance overlay
+                    show_hud = not show_hud
+                    redraw = True
+                elif event.key == pygame.K_LEFT:  # Step through the history
+                    redraw = game.step(-1) or redraw
+                elif event.key == pygame.K_RIGHT:
+                    redraw = game.step(1) or redraw
+                elif event.key == pygame.K_HOME:
+                    redraw = game.go_to_ply(0) or redraw
+                elif event.key == pygame.K_END:
+                    redraw = game.go_to_ply(len(game.history)) or redraw
+                elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                    redraw = game.undo() or redraw
+                elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+                    redraw = game.redo() or redraw
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWRESTORED):
+                # The window contents were lost, so repaint everything
+                if game.renderer is not None:
+                    game.renderer.invalidate()
+                redraw = True
+            elif event.type == pygame.VIDEORESIZE:
+                # Dragging a window edge sends a stream of these; lay out once it stops
+                resize_pending = event.size
+                resize_due = pygame.time.get_ticks() + RESIZE_DEBOUNCE_MS
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left mouse button
                     game.handle_click(event.pos)
+                    redraw = True
             elif event.type == pygame.MOUSEMOTION:
-                # Update piece info on hover
-                game.draw_piece_info(event.pos)
+                # Only the latest position matters, so coalesce motion events
+                motion_pos = event.pos
+            elif event.type == AI_MOVE_READY:
+                redraw = True
+            elif event.type == pygame.NOEVENT and show_hud:
+                # Idle timeout: refresh the overlay's FPS
+                redraw = True
+        events_end = time.perf_counter()
+        tracer.complete("events", frame_start, events_end)
+        
+        if resize_pending is not None and pygame.time.get_ticks() >= resize_due:
+            game.resize(*resize_pending)
+            resize_pending = None
+            redraw = True
+        
+        # Update piece info on hover, once per frame and only for a new square
+        if motion_pos is not None and game.draw_piece_info(motion_pos):
+            redraw = True
+        
+        # Pick up the AI's move once the background search has finished
+        if game.update():
+            redraw = True
+        update_end = time.perf_counter()
+        tracer.complete("update", events_end, update_end)
+        
+        if game.last_search is not traced_search:
+            # A move was searched, in the worker or synchronously in handle_click()
+            traced_search = game.last_search
+            if traced_search is not None and tracer.enabled:
+                tracer.complete(f"ai_move ({traced_search.source})",
+                                update_end - traced_search.elapsed, update_end, "ai",
+                                tid=AI_TRACE_TID,
+                                args={"depth": traced_search.depth, "nodes": traced_search.nodes})
+                tracer.counter("AI nodes/s", {"nodes_per_sec": traced_search.nps}, update_end)
         
-        screen.fill(BACKGROUND_COLOR)
-        game.draw_board()
-        pygame.display.flip()
-        clock.tick(60)
+        if redraw or not on_demand:
+            # Only the squares that changed are redrawn and pushed to the display
+            dirty_rects = game.draw_board()
+            if show_hud:
+                dirty_rects.append(game.renderer.draw_hud(hud_lines(game, frames)))
+            elif hud_shown:
+                dirty_rects.append(game.renderer.draw_hud(None))
+            hud_shown = show_hud
+            draw_end = time.perf_counter()
+            tracer.complete("draw_board", update_end, draw_end)
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+            frame_end = time.perf_counter()
+            tracer.complete("display.update", draw_end, frame_end)
+            frames.add(frame_start, frame_end)
+            redraw = False
+            clock.tick(60)  # Cap the frame rate while things are changing
     
+    stats = game.ponder_stats()
+    if stats["hits"] or stats["misses"]:
+        print(f"Pondering: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate)")
+        if stats["saved_seconds"] is not None:
+            print(f"Average AI reply: {stats['hit_latency_ms']:.0f} ms on a hit vs "
+                  f"{stats['search_latency_ms']:.0f} ms otherwise, "
+                  f"{stats['saved_seconds']:.1f} s saved")
+    game.shutdown()
     pygame.quit()
+    if trace_path:
+        tracer.write(trace_path)
+        print(f"Wrote {len(tracer.events)} trace events to {trace_path}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Play chess against the AI.")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="record frame and AI phases as Chrome trace-event JSON")
+    parser.add_argument("--hud", action="store_true", help="start with the performance overlay shown")
+    parser.add_argument("--ponder", action="store_true",
+                        help="let the AI think on your time (keeps a core busy while you think)")
+    parser.add_argument("--uci", nargs="?", const="", metavar="COMMAND",
+                        help="play against a UCI engine (default: the built-in stand-in)")
+    parser.add_argument("--uci-time", type=float, default=1.0, metavar="SECONDS",
+                        help="UCI engine think time per move (default %(default)s)")
+    parser.add_argument("--smp", type=int, metavar="WORKERS",
+                        help="search with this many worker processes sharing one hash table")
+    args = parser.parse_args()
+    engine = None
+    if args.uci is not None:
+        from uci_engine import UCIEngine
+        engine = UCIEngine(args.uci or None, time_limit=args.uci_time)
+    elif args.smp:
+        from parallel_search import ParallelSearchEngine
+        engine = ParallelSearchEngine(args.smp)
+    try:
+        main(trace_path=args.trace, show_hud=args.hud or SHOW_HUD, engine=engine,
+             ponder=args.ponder or PONDER)
+    finally:
+        if engine is not None:
+            engine.close()
@@ -0,0 +1,165 @@
+import argparse
+import random
+import time
+
+import chess
+import numpy as np
+
+from chess_engine import PIECE_VALUES, PIECE_SQUARE_TABLES
+
+# Bitboard planes in encoded positions: white P N B R Q K, then black P N B R Q K
+PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK)
+          for piece_type in range(chess.PAWN, chess.KING + 1)]
+MIRROR = np.array([chess.square_mirror(square) for square in chess.SQUARES])
+# BYTE_BITS[v] holds the 8 bits of byte value v, least significant first
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little")
+
+
+def default_weights():
+    """Material plus piece-square values, shape (6, 64), from white's point of view."""
+    weights = np.zeros((6, 64), dtype=np.int32)
+    for piece_type in range(chess.PAWN, chess.KING + 1):
+        weights[piece_type - 1] = PIECE_VALUES[piece_type] + np.array(PIECE_SQUARE_TABLES[piece_type])
+    return weights
+
+
+def encode(boards):
+    """Encode boards as bitboards: (N, 12) uint64 piece planes and (N,) side to move.
+
+    Only the 12 piece bitboards and the turn are kept, 97 bytes a position.
+    """
+    planes = np.empty((len(boards), len(PLANES)), dtype=np.uint64)
+    turns = np.empty(len(boards), dtype=bool)
+    for i, board in enumerate(boards):
+        planes[i] = [board.pieces_mask(piece_type, color) for color, piece_type in PLANES]
+        turns[i] = board.turn
+    return planes, turns
+
+
+def unpack(planes):
+    """Expand (N, 12) bitboards into (N, 12, 64) 0/1 square occupancy."""
+    as_bytes = planes.astype("<u8").view(np.uint8).reshape(len(planes), len(PLANES), 8)
+    return np.unpackbits(as_bytes, axis=-1, bitorder="little")
+
+
+class Evaluator:
+    """Material and piece-square evaluation, batched with NumPy.
+
+    Weights are a (6, 64) table per piece type and square for white; black
+    uses the vertically mirrored table with the sign flipped.
+
+    Batches are scored without unpacking bits: each of the 96 bytes of a
+    position's bitboards indexes a precomputed table of the summed weights
+    of the squares set in that byte, so a batch is one gather and one sum.
+    Single positions take a pure-Python fast path over set bits, which
+    beats NumPy's per-call overhead for one board.
+    """
+
+    def __init__(self, weights=None):
+        self.set_weights(default_weights() if weights is None else weights)
+
+    def set_weights(self, weights):
+        weights = np.asarray(weights)
+        self.weights = weights
+        # Signed (12, 64) table matching the plane order of encode()
+        self.signed = np.concatenate([weights, -weights[:, MIRROR]]).astype(np.int64)
+        # (96, 256): summed weights of the squares set in each bitboard byte
+        self.byte_tables = np.einsum("pbk,vk->pbv", self.signed.reshape(len(PLANES), 8, 8),
+                                     BYTE_BITS).reshape(len(PLANES) * 8, 256)
+        self.byte_index = np.arange(len(PLANES) * 8)
+        # Plain lists for the single-position path
+        self.square_values = [row.tolist() for row in self.signed]
+
+    def evaluate(self, board):
+        """Score one board in centipawns from the side to move's point of view."""
+        score = 0
+        for values, (color, piece_type) in zip(self.square_values, PLANES):
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                score += values[square]
+        return score if board.turn == chess.WHITE else -score
+
+    def evaluate_encoded(self, planes, turns):
+        """Score encoded positions; returns (N,) side-to-move scores."""
+        as_bytes = planes.astype("<u8").view(np.uint8).reshape(len(planes), len(PLANES) * 8)
+        white_scores = self.byte_tables[self.byte_index, as_bytes].sum(axis=1)
+        return np.where(turns, white_scores, -white_scores)
+
+    def evaluate_batch(self, boards):
+        """Score a list of boards, e.g. all children of a node, in one pass."""
+        return self.evaluate_encoded(*encode(boards))
+
+
+def evaluate_per_square(board):
+    """Reference evaluator: a piece_at() lookup on every square."""
+    score = 0
+    for square in chess.SQUARES:
+        piece = board.piece_at(square)
+        if piece:
+            table = PIECE_SQUARE_TABLES[piece.piece_type]
+            if piece.color == chess.WHITE:
+                score += PIECE_VALUES[piece.piece_type] + table[square]
+            else:
+                score -= PIECE_VALUES[piece.piece_type] + table[chess.square_mirror(square)]
+    return score if board.turn == chess.WHITE else -score
+
+
+def random_positions(count, seed=0, max_plies=80):
+    """Generate positions by random play, for benchmarking."""
+    rng = random.Random(seed)
+    positions = []
+    board = chess.Board()
+    while len(positions) < count:
+        moves = list(board.legal_moves)
+        if not moves or board.ply() >= max_plies:
+            board = chess.Board()
+            continue
+        board.push(rng.choice(moves))
+        positions.append(board.copy(stack=False))
+    return positions
+
+
+def benchmark(count=20000, seed=0):
+    """Compare positions/sec of the per-square, fast-path and batched evaluators."""
+    boards = random_positions(count, seed)
+    evaluator = Evaluator()
+    results = {}
+
+    start = time.perf_counter()
+    reference = [evaluate_per_square(board) for board in boards]
+    results["per_square"] = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    single = [evaluator.evaluate(board) for board in boards]
+    results["single"] = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    encoded = encode(boards)
+    results["encode"] = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    batched = evaluator.evaluate_encoded(*encoded)
+    results["batch"] = count / (time.perf_counter() - start)
+
+    if reference != single or reference != batched.tolist():
+        raise AssertionError("Evaluators disagree")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark position evaluation.")
+    parser.add_argument("-n", "--positions", type=int, default=20000, help="number of positions")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random positions")
+    args = parser.parse_args()
+
+    results = benchmark(args.positions, args.seed)
+    base = results["per_square"]
+    print(f"{args.positions} positions")
+    print(f"  per-square piece_at(): {results['per_square']:12,.0f} positions/s")
+    print(f"  single fast path:      {results['single']:12,.0f} positions/s "
+          f"({results['single'] / base:.1f}x)")
+    print(f"  encode to bitboards:   {results['encode']:12,.0f} positions/s")
+    print(f"  batched NumPy:         {results['batch']:12,.0f} positions/s "
+          f"({results['batch'] / base:.1f}x, excluding encoding)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import bisect
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+
+import chess
+
+# File layout: an 8-byte file header, then one record per game. A record is
+# a fixed-size game header followed by `plies` 16-bit moves, little-endian.
+MAGIC = b'CGA1'
+FILE_HEADER = struct.Struct('<4sHH')  # magic, version, reserved
+GAME_HEADER = struct.Struct('<IHBB')  # game id, plies, result, reserved
+VERSION = 1
+FLUSH_BYTES = 1 << 20  # Writer buffer size
+
+RESULTS = ['*', '1-0', '0-1', '1/2-1/2']
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+# Throughput targets checked by the benchmark (per core)
+WRITE_TARGET = 20000  # Games per second
+SCAN_TARGET = 20000000  # Moves per second over the mapped archive, open included
+
+
+def encode_move(move):
+    """Pack a move into 16 bits: from (6), to (6), promotion piece type (3)."""
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code):
+    promotion = (code >> 12) & 0x7
+    return chess.Move(code & 0x3f, (code >> 6) & 0x3f, promotion or None)
+
+
+def game_result(game):
+    """Return the PGN result string of a ChessGame."""
+    return game.outcome.result
+
+
+class ArchiveWriter:
+    """Append games to a binary archive.
+
+    Moves are encoded into an array('H') and written with the fixed-size
+    game header through a buffer, so appending a game costs one pass over
+    its moves and no per-move Python objects on disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'ab')
+        if new:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self.buffer = bytearray()
+        self.count = 0
+
+    def append(self, moves, result='*', game_id=None):
+        """Append one game played from the standard starting position."""
+        encoded = array('H', map(encode_move, moves))
+        if len(encoded) > 0xffff:
+            raise ValueError("Game too long for the archive format")
+        if game_id is None:
+            game_id = self.count
+        self.buffer += GAME_HEADER.pack(game_id, len(encoded), RESULT_CODES[result], 0)
+        if sys.byteorder != 'little':
+            encoded.byteswap()
+        self.buffer += encoded.tobytes()
+        self.count += 1
+        if len(self.buffer) >= FLUSH_BYTES:
+            self.flush()
+
+    def append_game(self, game, game_id=None):
+        """Append a finished ChessGame."""
+        if game.board.root() != chess.Board():
+            raise ValueError("Only games from the standard starting position can be archived")
+        self.append(game.board.move_stack, game_result(game), game_id)
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer = bytearray()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """Memory-mapped reader for binary game archives.
+
+    Opening the archive walks the game headers once to record where each
+    game starts; move data is never copied. Games are returned as
+    zero-copy memoryviews of 16-bit codes straight out of the map, so
+    scanning millions of games creates no Move objects unless a caller
+    decodes them. Release those views before calling close(). The views
+    use native byte order, so reading assumes a little-endian host.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = FILE_HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} game archive")
+        self.view = memoryview(self.mmap)
+        self.offsets = array('Q')  # Offset of each game header
+        # Positions (plies + 1) in the games up to and including each one
+        self.position_ends = array('Q')
+        self.total_plies = 0
+        position = FILE_HEADER.size
+        end = len(self.mmap)
+        while position + GAME_HEADER.size <= end:
+            plies = GAME_HEADER.unpack_from(self.mmap, position)[1]
+            if position + GAME_HEADER.size + 2 * plies > end:
+                break  # Truncated final record from an interrupted write
+            self.offsets.append(position)
+            self.total_plies += plies
+            self.position_ends.append(self.total_plies + len(self.offsets))
+            position += GAME_HEADER.size + 2 * plies
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        self.view.release()
+        self.mmap.close()
+        self.file.close()
+
+    def header(self, index):
+        """Return (game id, plies, result) of a game."""
+        game_id, plies, result, _ = GAME_HEADER.unpack_from(self.mmap, self.offsets[index])
+        return game_id, plies, RESULTS[result]
+
+    def moves(self, index):
+        """Return a game's moves as a zero-copy memoryview of 16-bit codes."""
+        start = self.offsets[index] + GAME_HEADER.size
+        plies = GAME_HEADER.unpack_from(self.mmap, self.offsets[index])[1]
+        return self.view[start:start + 2 * plies].cast('H')
+
+    def __iter__(self):
+        """Yield (game id, result, moves view) for every game."""
+        for index in range(len(self.offsets)):
+            game_id, plies, result = self.header(index)
+            start = self.offsets[index] + GAME_HEADER.size
+            yield game_id, result, self.view[start:start + 2 * plies].cast('H')
+
+    def board(self, index, ply=None):
+        """Replay a game up to ply (default: the end) and return the board."""
+        board = chess.Board()
+        codes = self.moves(index)
+        for code in codes[:ply] if ply is not None else codes:
+            board.push(decode_move(code))
+        return board
+
+    def sample(self, count, rng=None):
+        """Pick count random (game index, ply) positions, uniform over all plies.
+
+        Each position of the archive (a game of n plies has n + 1) is
+        equally likely, so long games are drawn more often than short
+        ones. A global position number is drawn and located by binary
+        search over the running position counts.
+        """
+        rng = rng or random.Random()
+        total = self.position_ends[-1] if self.position_ends else 0
+        samples = []
+        for _ in range(count):
+            position = rng.randrange(total)
+            index = bisect.bisect_right(self.position_ends, position)
+            samples.append((index, position - (self.position_ends[index - 1] if index else 0)))
+        return samples
+
+
+def benchmark(path, games=20000, plies=80, seed=0):
+    """Measure write and scan throughput against WRITE_TARGET and SCAN_TARGET."""
+    rng = random.Random(seed)
+    # Random legal games to write, generated up front so only writing is timed
+    sample_games = []
+    for _ in range(100):
+        board = chess.Board()
+        while len(board.move_stack) < plies and not board.is_game_over():
+            board.push(rng.choice(list(board.legal_moves)))
+        sample_games.append(list(board.move_stack))
+
+    if os.path.exists(path):
+        os.remove(path)
+    start = time.perf_counter()
+    with ArchiveWriter(path) as writer:
+        for i in range(games):
+            writer.append(sample_games[i % len(sample_games)], '1/2-1/2', i)
+    write_rate = games / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    reader = ArchiveReader(path)
+    scanned = 0
+    for _, _, moves in reader:
+        scanned += len(moves)
+        moves.release()
+    scan_rate = scanned / (time.perf_counter() - start)
+    reader.close()
+    return {
+        "games": games,
+        "bytes": os.path.getsize(path),
+        "write_games_per_sec": write_rate,
+        "scan_moves_per_sec": scan_rate,
+        "write_ok": write_rate >= WRITE_TARGET,
+        "scan_ok": scan_rate >= SCAN_TARGET,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or benchmark a binary game archive.")
+    parser.add_argument("archive", help="archive file")
+    parser.add_argument("--bench", type=int, metavar="GAMES",
+                        help="overwrite archive with GAMES synthetic games and time writing and scanning")
+    parser.add_argument("--sample", type=int, metavar="COUNT", help="print COUNT random positions")
+    args = parser.parse_args()
+
+    if args.bench:
+        results = benchmark(args.archive, args.bench)
+        print(f"{results['games']} games, {results['bytes'] / results['games']:.1f} bytes/game")
+        print(f"Write: {results['write_games_per_sec']:,.0f} games/s "
+              f"(target {WRITE_TARGET:,}: {'ok' if results['write_ok'] else 'MISSED'})")
+        print(f"Scan:  {results['scan_moves_per_sec']:,.0f} moves/s "
+              f"(target {SCAN_TARGET:,}: {'ok' if results['scan_ok'] else 'MISSED'})")
+        return
+
+    reader = ArchiveReader(args.archive)
+    print(f"{len(reader)} games, {reader.total_plies} plies")
+    if args.sample:
+        for index, ply in reader.sample(args.sample):
+            print(f"game {index} ply {ply}: {reader.board(index, ply).fen()}")
+    reader.close()
+
+if __name__ == "__main__":
+    main()
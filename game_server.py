@@ -0,0 +1,438 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+from chess_core import ChessGameCore
+from chess_engine import SearchEngine, SearchResult, load_default_evaluate
+from opening_book import load_default_book
+from tablebase import load_default_tablebase
+
+# Defaults
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_SESSIONS = 1000
+MIN_MOVE_TIME = 0.05  # Shortest AI think time a session may ask for, in seconds
+MAX_MOVE_TIME = 5.0  # Longest AI think time a session may ask for
+DEFAULT_MOVE_TIME = 1.0
+SEARCH_GRACE = 5.0  # Extra seconds before a search that hasn't answered counts as failed
+QUEUE_TIMEOUT = 30.0  # Longest a move waits for a free search slot before "busy"
+IDLE_TIMEOUT = 300.0  # Sessions silent for this long are closed
+MAX_LINE = 1 << 16  # Longest accepted message
+
+# Engine reused by every search a worker process runs
+_engine = None
+
+def init_worker():
+    """Create the per-process engine once, so searches don't pay for a new TT."""
+    global _engine
+    _engine = SearchEngine(tablebase=load_default_tablebase(), evaluate=load_default_evaluate())
+
+def move_time(value):
+    """Check a requested think time and clamp it to [MIN_MOVE_TIME, MAX_MOVE_TIME].
+
+    Zero means "no deadline" to SearchEngine, so it is refused along with
+    negative and non-finite values: every pool search must end by itself.
+    """
+    value = float(value)
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError("time_limit must be a positive number of seconds")
+    return min(max(value, MIN_MOVE_TIME), MAX_MOVE_TIME)
+
+def search_position(fen, moves, time_limit, node_limit):
+    """Search the position after moves from fen in a worker process.
+
+    The move list is replayed so the engine sees the game's repetitions.
+    Returns plain values, which pickle cheaply.
+    """
+    board = chess.Board(fen)
+    for move in moves:
+        board.push_uci(move)
+    result = _engine.search(board, time_limit=time_limit, node_limit=node_limit)
+    return (result.move.uci() if result.move else None, result.score, result.depth,
+            result.nodes, result.elapsed, [move.uci() for move in result.pv], result.source)
+
+
+class SearchTimedOut(Exception):
+    """A pool search didn't answer within its time limit plus SEARCH_GRACE."""
+
+
+class PoolEngine:
+    """Engine interface over a process pool shared by every session.
+
+    search_async() awaits a worker without blocking the event loop. At
+    most max_pending searches are running or waiting for a worker;
+    callers beyond that wait for a slot. A search is only handed to the
+    pool once a worker is free, so it starts running at once and its
+    answer deadline doesn't include time spent queued. Slots and workers
+    are held until the worker is done, even by a search whose caller
+    gave up waiting. search() blocks and fits the engine interface
+    ChessGameCore expects.
+    """
+
+    def __init__(self, pool, workers, max_pending, time_limit=DEFAULT_MOVE_TIME):
+        self.pool = pool
+        self.slots = asyncio.Semaphore(max_pending)
+        self.idle = asyncio.Semaphore(workers)  # Workers free to start a search
+        self.time_limit = time_limit
+        self.searches = 0
+
+    def args(self, board, time_limit, node_limit):
+        root = board.root()
+        return (root.fen(), [move.uci() for move in board.move_stack],
+                move_time(self.time_limit if time_limit is None else time_limit), node_limit)
+
+    def search(self, board, time_limit=None, node_limit=None, max_depth=None, stop_event=None):
+        args = self.args(board, time_limit, node_limit)
+        return result_from_values(self.pool.submit(search_position, *args).result())
+
+    async def reserve(self):
+        """Take a slot, then wait for a free worker."""
+        await self.slots.acquire()
+        try:
+            await self.idle.acquire()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self):
+        self.idle.release()
+        self.slots.release()
+
+    async def search_async(self, board, time_limit=None, node_limit=None):
+        """Search in the pool.
+
+        Raises asyncio.TimeoutError if no worker frees up within
+        QUEUE_TIMEOUT, and SearchTimedOut if the worker doesn't answer in
+        time.
+        """
+        args = self.args(board, time_limit, node_limit)
+        await asyncio.wait_for(self.reserve(), QUEUE_TIMEOUT)
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.pool, search_position, *args)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        try:
+            # A worker was free, so the search is running from now on.
+            # Shielded, so giving up on the answer doesn't free the worker early
+            values = await asyncio.wait_for(asyncio.shield(future), args[2] + SEARCH_GRACE)
+        except asyncio.TimeoutError:
+            raise SearchTimedOut(f"no answer after {args[2] + SEARCH_GRACE:.1f}s") from None
+        self.searches += 1
+        return result_from_values(values)
+
+
+def result_from_values(values):
+    move, score, depth, nodes, elapsed, pv, source = values
+    return SearchResult(chess.Move.from_uci(move) if move else None, score, depth, nodes,
+                        elapsed, [chess.Move.from_uci(uci) for uci in pv], source=source)
+
+
+class GameServer:
+    """Asyncio TCP server running many headless games against the AI.
+
+    The protocol is one JSON object per line in each direction. A client
+    sends {"type": "new"} (optionally with "color", "time_limit" and
+    "nodes"), {"type": "move", "move": "e2e4"}, {"type": "state"} or
+    {"type": "stats"}, and gets one reply per message: the game state,
+    with the AI's answer already played after a move, or an error. If the
+    AI's search fails, its move is retried on the session's next "move"
+    or "state" message.
+
+    Each connection owns one ChessGameCore. Sessions only wait on I/O and
+    the shared process pool, so a long search never blocks other games.
+    A session handles one message at a time and the server doesn't read
+    its next line until the reply is written and drained, so a flooding
+    client is slowed by TCP flow control. Searches beyond the pool's
+    pending limit queue for a slot, and connections beyond max_sessions
+    are refused.
+    """
+
+    def __init__(self, workers=None, max_sessions=MAX_SESSIONS, max_pending=None, book=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        self.engine = PoolEngine(self.pool, self.workers, max_pending or 2 * self.workers)
+        if book is None:
+            book = load_default_book()
+        self.book = book or None
+        self.max_sessions = max_sessions
+        self.sessions = 0
+        self.peak_sessions = 0
+        self.moves = 0
+        self.refused = 0
+        self.search_latencies = []
+        self.started = time.perf_counter()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+        print(f"Serving on {host}:{port} with {self.workers} search workers")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def new_session(self, color=chess.WHITE):
+        game = ChessGameCore(engine=self.engine, book=self.book, tablebase=False)
+        game.player_color = color
+        game.ai_color = not color
+        return game
+
+    async def handle_connection(self, reader, writer):
+        if self.sessions >= self.max_sessions:
+            self.refused += 1
+            await self.send(writer, {"type": "error", "error": "server full"})
+            writer.close()
+            return
+        self.sessions += 1
+        self.peak_sessions = max(self.peak_sessions, self.sessions)
+        game = self.new_session()
+        limits = {"time_limit": DEFAULT_MOVE_TIME, "nodes": None}
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await self.send(writer, {"type": "error", "error": "idle timeout"})
+                    break
+                except ValueError:
+                    # readline() raises this for a line over MAX_LINE; the stream can't resync
+                    await self.send(writer, {"type": "error", "error": f"message over {MAX_LINE} bytes"})
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    reply = await self.handle_message(game, limits, message)
+                    if message.get("type") == "new":
+                        game = reply.pop("game")
+                except (ValueError, AttributeError, TypeError, OverflowError) as error:
+                    reply = {"type": "error", "error": f"bad message: {error}"}
+                await self.send(writer, reply)
+        except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def send(self, writer, message):
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+
+    async def handle_message(self, game, limits, message):
+        kind = message.get("type")
+        if kind == "new":
+            color = chess.BLACK if message.get("color") == "black" else chess.WHITE
+            time_limit = move_time(message.get("time_limit", DEFAULT_MOVE_TIME))
+            nodes = int(message.get("nodes") or 0)
+            if nodes < 0:
+                raise ValueError("nodes must be positive")
+            limits["time_limit"] = time_limit
+            limits["nodes"] = nodes or None
+            game = self.new_session(color)
+            error = await self.play_ai(game, limits)
+            reply = self.state(game, error)
+            reply["game"] = game
+            return reply
+        if kind in ("move", "state") and not game.game_over and game.board.turn == game.ai_color:
+            # The AI's last search failed (server busy or timed out), so try it again
+            error = await self.play_ai(game, limits)
+            if error is None and kind == "move":
+                error = "move not played: the AI had to move first"
+            return self.state(game, error)
+        if kind == "move":
+            if game.game_over or game.board.turn != game.player_color:
+                return {"type": "error", "error": "not your turn"}
+            try:
+                move = chess.Move.from_uci(message["move"])
+            except (KeyError, ValueError):
+                return {"type": "error", "error": "move must be UCI, e.g. e2e4"}
+            if not game.make_move(move.from_square, move.to_square, move.promotion):
+                return {"type": "error", "error": f"illegal move {move.uci()}"}
+            self.moves += 1
+            error = await self.play_ai(game, limits)
+            return self.state(game, error)
+        if kind == "state":
+            return self.state(game)
+        if kind == "stats":
+            return self.stats()
+        return {"type": "error", "error": f"unknown message type {kind!r}"}
+
+    async def play_ai(self, game, limits):
+        """Play the AI's move if it is to move; returns an error string or None."""
+        if game.game_over or game.board.turn != game.ai_color:
+            return None
+        result = game.book_move()
+        if result is None:
+            start = time.perf_counter()
+            try:
+                result = await self.engine.search_async(game.board, limits["time_limit"],
+                                                        limits["nodes"])
+            except asyncio.TimeoutError:
+                return "server busy, no search slot came free"
+            except SearchTimedOut as error:
+                return f"AI search timed out: {error}"
+            self.search_latencies.append(time.perf_counter() - start)
+            del self.search_latencies[:-10000]
+        game.apply_ai_result(result)
+        return None
+
+    def state(self, game, error=None):
+        result = game.last_search
+        state = {
+            "type": "state",
+            "fen": game.board.fen(),
+            "moves": [move.uci() for move in game.board.move_stack],
+            "turn": "white" if game.board.turn == chess.WHITE else "black",
+            "player": "white" if game.player_color == chess.WHITE else "black",
+            "status": game.status_message,
+            "game_over": game.game_over,
+            "result": game.outcome.result,
+            "last_move": game.last_move.uci() if game.last_move else None,
+        }
+        if result is not None:
+            state["ai"] = {"move": result.move.uci() if result.move else None,
+                           "source": result.source, "score": result.score,
+                           "depth": result.depth, "nodes": result.nodes,
+                           "elapsed": round(result.elapsed, 4)}
+        if error:
+            state["error"] = error
+        return state
+
+    def stats(self):
+        latencies = sorted(self.search_latencies)
+        return {
+            "type": "stats",
+            "sessions": self.sessions,
+            "peak_sessions": self.peak_sessions,
+            "refused": self.refused,
+            "player_moves": self.moves,
+            "searches": self.engine.searches,
+            "search_p50_ms": round(1e3 * statistics.median(latencies), 1) if latencies else None,
+            "uptime": round(time.perf_counter() - self.started, 1),
+        }
+
+
+async def load_session(host, port, moves, rng, options, latencies, errors):
+    """One simulated player: random legal moves, timing each move until the reply."""
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+
+    async def request(message):
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    try:
+        state = await request(dict(options, type="new"))
+        for _ in range(moves):
+            if state.get("type") == "error":
+                errors.append(state["error"])
+                break
+            if state["game_over"]:
+                state = await request(dict(options, type="new"))
+                continue
+            board = chess.Board(state["fen"])
+            move = rng.choice(list(board.legal_moves))
+            start = time.perf_counter()
+            state = await request({"type": "move", "move": move.uci()})
+            latencies.append(time.perf_counter() - start)
+            if state.get("error"):
+                errors.append(state["error"])
+    except ConnectionError as error:
+        errors.append(str(error))
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, sessions, moves, seed, options):
+    """Run concurrent simulated players; returns latency and throughput numbers."""
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(load_session(host, port, moves, random.Random(seed + i), options,
+                                        latencies, errors)
+                           for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+
+    # The server's own view, e.g. how many sessions were open at once
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    writer.write(b'{"type": "stats"}\n')
+    await writer.drain()
+    server_stats = json.loads(await reader.readline())
+    writer.close()
+
+    def pct(fraction):
+        return 1e3 * ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+    return {
+        "sessions": sessions,
+        "moves": len(latencies),
+        "seconds": elapsed,
+        "moves_per_sec": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": pct(1.0),
+        "errors": errors,
+        "server": server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve many chess games over TCP, or load-test a server.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the game server")
+    serve.add_argument("-w", "--workers", type=int, default=None,
+                       help="search processes (default: one per CPU)")
+    serve.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    serve.add_argument("--max-pending", type=int, default=None,
+                       help="searches queued at the pool before sessions wait (default: 2 per worker)")
+
+    load = commands.add_parser("load", help="load-test a running server with simulated players")
+    load.add_argument("-s", "--sessions", type=int, default=50, help="concurrent players")
+    load.add_argument("-m", "--moves", type=int, default=20, help="moves per player")
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--time", type=float, default=0.2, help="AI think time per move")
+    load.add_argument("--nodes", type=int, default=None, help="AI node budget per move")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = GameServer(args.workers, args.max_sessions, args.max_pending)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return
+
+    options = {"time_limit": args.time}
+    if args.nodes:
+        options["nodes"] = args.nodes
+    results = asyncio.run(load_test(args.host, args.port, args.sessions, args.moves, args.seed,
+                                    options))
+    print(f"{results['sessions']} concurrent sessions (server peak "
+          f"{results['server'].get('peak_sessions')}), {results['moves']} moves "
+          f"in {results['seconds']:.1f}s ({results['moves_per_sec']:.1f} moves/s)")
+    print(f"Move latency: p50 {results['p50_ms']:.0f} ms, p95 {results['p95_ms']:.0f} ms, "
+          f"p99 {results['p99_ms']:.0f} ms, max {results['max_ms']:.0f} ms")
+    if results["errors"]:
+        print(f"{len(results['errors'])} errors, e.g. {results['errors'][0]}")
+
+if __name__ == "__main__":
+    main()
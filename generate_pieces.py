@@ -1,12 +1,24 @@
 import pygame
+import argparse
+import hashlib
+import inspect
+import json
 import os
 import math
+from concurrent.futures import ProcessPoolExecutor
+
+from chess_gui import BOARD_SIZE, piece_size_for
 
 # Initialize pygame
 pygame.init()
 
 # Constants
-PIECE_SIZE = 100
+PIECE_SIZE = 100  # Pieces are drawn at this size and scaled down for each atlas
+ATLAS_BOARDS = (400, 600, 800, 900)  # Board sizes in pixels whose pieces get an exact atlas
+ATLAS_SIZES = tuple(piece_size_for(board // BOARD_SIZE) for board in ATLAS_BOARDS)
+OUTPUT_DIR = 'pieces'
+MANIFEST_NAME = 'atlas.json'
+PIECE_CHARS = ['P', 'N', 'B', 'R', 'Q', 'K', 'p', 'n', 'b', 'r', 'q', 'k']  # Atlas order
 
 # Colors
 WHITE = (255, 255, 255)
@@ -16,7 +28,7 @@ DARK_GRAY = (80, 80, 80)
 GOLD = (212, 175, 55)
 SILVER = (192, 192, 192)
 
-def create_piece_image(piece_char, output_dir):
+def create_piece_image(piece_char):
     """Create a more professional looking image for a chess piece."""
     surface = pygame.Surface((PIECE_SIZE, PIECE_SIZE), pygame.SRCALPHA)
     
@@ -43,10 +55,7 @@ def create_piece_image(piece_char, output_dir):
     elif piece_type == 'K':  # King
         draw_king(surface, piece_color, outline_color, highlight_color)
     
-    # Save the image
-    output_path = os.path.join(output_dir, f'{piece_char}.png')
-    pygame.image.save(surface, output_path)
-    print(f"Created {output_path}")
+    return surface
 
 def draw_pawn(surface, color, outline, highlight):
     """Draw a more professional pawn piece."""
@@ -159,18 +168,90 @@ def draw_king(surface, color, outline, highlight):
     # Highlight
     pygame.draw.arc(surface, highlight, (35, 30, 30, 20), math.pi/4, math.pi, 2)
 
-def main():
-    # Create pieces directory if it doesn't exist
-    output_dir = 'pieces'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+DRAWING_CODE = [create_piece_image, draw_pawn, draw_rook, draw_knight, draw_bishop,
+                draw_queen, draw_king]
+
+def content_hash(sizes):
+    """Hash everything the atlases depend on: drawing code, colors and sizes."""
+    digest = hashlib.sha256()
+    for function in DRAWING_CODE:
+        digest.update(inspect.getsource(function).encode())
+    digest.update(repr((WHITE, BLACK, LIGHT_GRAY, DARK_GRAY, GOLD, SILVER)).encode())
+    digest.update(repr((PIECE_SIZE, sorted(sizes), PIECE_CHARS)).encode())
+    return digest.hexdigest()
+
+def atlas_name(size):
+    return f'atlas_{size}.png'
+
+def render_atlas(size, output_dir=OUTPUT_DIR):
+    """Draw all 12 pieces into one size x size grid, white on the top row.
     
-    # Generate all piece images
-    piece_chars = ['p', 'r', 'n', 'b', 'q', 'k', 'P', 'R', 'N', 'B', 'Q', 'K']
-    for piece in piece_chars:
-        create_piece_image(piece, output_dir)
+    Returns the manifest entry: the image name and each piece's rect.
+    """
+    atlas = pygame.Surface((6 * size, 2 * size), pygame.SRCALPHA)
+    rects = {}
+    for index, piece in enumerate(PIECE_CHARS):
+        image = create_piece_image(piece)
+        if size != PIECE_SIZE:
+            image = pygame.transform.smoothscale(image, (size, size))
+        rect = ((index % 6) * size, (index // 6) * size, size, size)
+        atlas.blit(image, rect[:2])
+        rects[piece] = rect
+    pygame.image.save(atlas, os.path.join(output_dir, atlas_name(size)))
+    return {"image": atlas_name(size), "pieces": rects}
+
+def load_manifest(output_dir=OUTPUT_DIR):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_up_to_date(manifest, digest, output_dir=OUTPUT_DIR):
+    """True if the manifest was built from the same content hash and its atlases exist."""
+    return (manifest is not None and manifest.get("hash") == digest
+            and all(os.path.exists(os.path.join(output_dir, entry["image"]))
+                    for entry in manifest["atlases"].values()))
+
+def build_atlases(sizes=ATLAS_SIZES, output_dir=OUTPUT_DIR, force=False, workers=None):
+    """Render one atlas per size in parallel and write the manifest.
+    
+    Returns False without rendering if the existing atlases were built from
+    the same drawing code and sizes.
+    """
+    digest = content_hash(sizes)
+    previous = load_manifest(output_dir)
+    if not force and is_up_to_date(previous, digest, output_dir):
+        return False
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        entries = list(pool.map(render_atlas, sizes, [output_dir] * len(sizes)))
+    manifest = {"hash": digest,
+                "atlases": {str(size): entry for size, entry in zip(sizes, entries)}}
+    # Written last, so an interrupted build is redone on the next run
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    # Drop atlases of sizes that are no longer built
+    if previous is not None:
+        for size, entry in previous.get("atlases", {}).items():
+            if size not in manifest["atlases"]:
+                path = os.path.join(output_dir, entry["image"])
+                if os.path.exists(path):
+                    os.remove(path)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the chess piece sprite atlases.")
+    parser.add_argument("--force", action="store_true", help="rebuild even if nothing changed")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
     
-    print("All piece images generated successfully!")
+    if build_atlases(force=args.force, workers=args.workers):
+        sizes = ", ".join(str(size) for size in ATLAS_SIZES)
+        print(f"Generated piece atlases for sizes {sizes} in {OUTPUT_DIR}/")
+    else:
+        print("Piece atlases are up to date")
 
 if __name__ == "__main__":
     main()
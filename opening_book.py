@@ -0,0 +1,129 @@
+import mmap
+import os
+import random
+import struct
+import time
+
+import chess
+import chess.polyglot
+
+# Constants
+OPENING_BOOK_PATH = os.path.join('books', 'book.bin')  # Used when present
+BOOK_DEPTH = 16  # Stop consulting the book after this many plies
+
+# Polyglot entries are 16 bytes, big-endian, sorted by key:
+# key (u64), move (u16), weight (u16), learn (u32)
+ENTRY_SIZE = 16
+KEY_STRUCT = struct.Struct(">Q")
+MOVE_WEIGHT_STRUCT = struct.Struct(">HH")
+
+
+class OpeningBook:
+    """Polyglot opening book read through a memory map.
+
+    The .bin file is mapped, never parsed: lookups binary-search the sorted
+    keys straight out of the mmap and unpack only the handful of entries
+    for the position being probed. Opening a large book costs one mmap()
+    call, resident memory only grows by the pages lookups touch, and the
+    file is mapped lazily on the first lookup.
+    """
+
+    def __init__(self, path, max_depth=BOOK_DEPTH, seed=None):
+        self.path = path
+        self.max_depth = max_depth
+        self.rng = random.Random(seed)
+        self.file = None
+        self.mmap = None
+        self.size = 0  # Number of entries
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_time = 0.0
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, "rb")
+            length = os.fstat(self.file.fileno()).st_size
+            if length >= ENTRY_SIZE:
+                self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size = length // ENTRY_SIZE
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
+
+    def entries(self, key):
+        """Return raw (move, weight) pairs stored for a Zobrist key."""
+        self.open()
+        data = self.mmap
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY_STRUCT.unpack_from(data, mid * ENTRY_SIZE)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        while lo < self.size and KEY_STRUCT.unpack_from(data, lo * ENTRY_SIZE)[0] == key:
+            found.append(MOVE_WEIGHT_STRUCT.unpack_from(data, lo * ENTRY_SIZE + 8))
+            lo += 1
+        return found
+
+    def decode_move(self, board, raw):
+        """Turn a Polyglot move into a legal chess.Move for board, or None."""
+        to_square = raw & 0x3f
+        from_square = (raw >> 6) & 0x3f
+        promotion = (raw >> 12) & 0x7
+        # Polyglot writes castling as king takes own rook
+        if from_square == board.king(board.turn) and board.castling_rights & chess.BB_SQUARES[to_square]:
+            file = 6 if chess.square_file(to_square) > chess.square_file(from_square) else 2
+            to_square = chess.square(file, chess.square_rank(from_square))
+        move = chess.Move(from_square, to_square, promotion + 1 if promotion else None)
+        return move if board.is_legal(move) else None
+
+    def choose(self, board):
+        """Return a weighted-random book move for board, or None if out of book."""
+        if board.ply() >= self.max_depth:
+            return None
+        start = time.perf_counter()
+        entries = self.entries(chess.polyglot.zobrist_hash(board))
+        move = None
+        total = sum(weight for _, weight in entries)
+        if total:
+            # Only the chosen entry needs decoding and a legality check
+            pick = self.rng.randrange(total)
+            for raw, weight in entries:
+                pick -= weight
+                if pick < 0:
+                    move = self.decode_move(board, raw)
+                    break
+        self.lookups += 1
+        self.lookup_time += time.perf_counter() - start
+        if move is not None:
+            self.hits += 1
+        return move
+
+    def moves(self, board):
+        """Return (move, weight) pairs for every book move in board."""
+        moves = []
+        for raw, weight in self.entries(chess.polyglot.zobrist_hash(board)):
+            move = self.decode_move(board, raw)
+            if move is not None:
+                moves.append((move, weight))
+        return moves
+
+    @property
+    def average_lookup_us(self):
+        """Mean lookup latency in microseconds."""
+        return 1e6 * self.lookup_time / self.lookups if self.lookups else 0.0
+
+
+def load_default_book():
+    """Return an OpeningBook for OPENING_BOOK_PATH, or None if there is no book there."""
+    if os.path.exists(OPENING_BOOK_PATH):
+        return OpeningBook(OPENING_BOOK_PATH)
+    return None
@@ -0,0 +1,273 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import statistics
+import threading
+import time
+from multiprocessing import shared_memory
+
+import chess
+from chess_engine import SearchEngine, SearchResult, load_default_evaluate
+from game_archive import decode_move, encode_move
+from tablebase import load_default_tablebase
+
+# Constants
+SHARED_TT_SIZE = 1 << 20  # Entries (16 bytes each) in the shared table; a power of two
+SMP_TIME_LIMIT = 1.0
+POLL_INTERVAL = 0.01  # Seconds between checks of the caller's stop and ponder events
+WORKER_COUNTS = (1, 2, 4, 8)  # Worker counts compared by the benchmark
+
+BENCH_POSITIONS = [
+    chess.STARTING_FEN,
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 9",
+    "r2q1rk1/1b2bppp/p2ppn2/1p6/3NP3/1BN1B3/PPPQ1PPP/R4RK1 w - - 0 12",
+    "8/5pk1/6p1/3R4/1r6/6P1/5PK1/8 w - - 0 40",
+]
+
+# Layout of the data word: score (32 bits, offset), move (16), depth (8),
+# flag (2) and search age (6)
+SCORE_OFFSET = 1 << 31
+AGE_MASK = 0x3f
+
+
+class SharedTranspositionTable:
+    """Transposition table in shared memory, usable from several processes at once.
+
+    Each entry is two 64-bit words: the data packed into one word, and the
+    Zobrist key XORed with that data. Writers store both words without a
+    lock; a reader recomputes the key from the pair, so an entry torn by
+    two processes writing at once no longer matches and reads as a miss
+    (Hyatt's lockless hashing). Methods match TranspositionTable, so
+    SearchEngine uses either.
+    """
+
+    def __init__(self, size=SHARED_TT_SIZE, name=None):
+        if size & (size - 1):
+            raise ValueError("Transposition table size must be a power of two")
+        self.size = size
+        self.mask = size - 1
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=16 * size)
+            self.shm.buf[:] = bytes(16 * size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast('Q')
+        self.age = 0
+
+    def close(self):
+        """Detach from the table; the creating process also frees it."""
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def new_search(self):
+        """Age existing entries so they are replaced first.
+
+        Every process sharing the table runs every search, so their ages
+        stay in step.
+        """
+        self.age = (self.age + 1) & AGE_MASK
+
+    def clear(self):
+        """Drop every entry, for all processes."""
+        self.shm.buf[:] = bytes(16 * self.size)
+
+    def probe(self, key):
+        """Return (depth, score, flag, move) for key, or None on a miss."""
+        index = (key & self.mask) << 1
+        data = self.words[index + 1]
+        if self.words[index] ^ data != key or not data:
+            return None
+        code = (data >> 32) & 0xffff
+        return ((data >> 48) & 0xff, (data & 0xffffffff) - SCORE_OFFSET, (data >> 56) & 0x3,
+                decode_move(code) if code else None)
+
+    def store(self, key, depth, score, flag, move):
+        """Store an entry, with TranspositionTable's replacement policy."""
+        index = (key & self.mask) << 1
+        resident = self.words[index + 1]
+        same = resident and self.words[index] ^ resident == key
+        if (resident and not same and (resident >> 58) == self.age
+                and depth < (resident >> 48) & 0xff):
+            return
+        if move is None:
+            # Keep the old best move if the new entry has none
+            code = (resident >> 32) & 0xffff if same else 0
+        else:
+            code = encode_move(move)
+        data = ((score + SCORE_OFFSET) | (code << 32) | (depth << 48) | (flag << 56)
+                | (self.age << 58))
+        self.words[index + 1] = data
+        self.words[index] = key ^ data
+
+
+def worker_main(index, table_name, table_size, tasks, results, stop, ponder_hit):
+    """Search every task from tasks with a SearchEngine on the shared table.
+
+    Odd-numbered workers start iterating one ply deeper, so workers don't
+    all search the same depth at the same time.
+    """
+    tt = SharedTranspositionTable(table_size, name=table_name)
+    engine = SearchEngine(tt=tt, tablebase=load_default_tablebase(), evaluate=load_default_evaluate(),
+                          start_depth=1 + index % 2)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        search_id, fen, moves, time_limit, node_limit, max_depth, ponder = task
+        board = chess.Board(fen)
+        for move in moves:
+            board.push_uci(move)
+        result = engine.search(board, time_limit=time_limit, node_limit=node_limit,
+                               max_depth=max_depth, stop_event=stop,
+                               ponder_hit=ponder_hit if ponder else None)
+        results.put((search_id, index, result.move.uci() if result.move else None, result.score,
+                     result.depth, result.nodes, [move.uci() for move in result.pv],
+                     result.source))
+    tt.close()
+
+
+class ParallelSearchEngine:
+    """Lazy SMP: several processes search the same root through one shared table.
+
+    Each worker process runs its own SearchEngine, so the search isn't
+    held to one core by the GIL; they cooperate only through the
+    SharedTranspositionTable, where each one's results steer the others'
+    move ordering and cut their searches short. The first worker to
+    finish stops the rest, and the move comes from the deepest completed
+    iteration. search() matches SearchEngine.search(); node_limit
+    applies to each worker.
+    """
+
+    def __init__(self, workers=None, time_limit=SMP_TIME_LIMIT, node_limit=None, max_depth=None,
+                 tt_size=SHARED_TT_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.tt = SharedTranspositionTable(tt_size)
+        self.stop = multiprocessing.Event()
+        self.ponder_hit = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.tasks = [multiprocessing.Queue() for _ in range(self.workers)]
+        self.processes = [multiprocessing.Process(target=worker_main, name=f"smp-{index}", daemon=True,
+                                                  args=(index, self.tt.name, tt_size, self.tasks[index],
+                                                        self.results, self.stop, self.ponder_hit))
+                          for index in range(self.workers)]
+        for process in self.processes:
+            process.start()
+        self.search_id = 0
+        self.lock = threading.Lock()  # One search at a time across the workers
+
+    def close(self):
+        """Stop the worker processes and free the shared table."""
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.tt.close()
+
+    def new_game(self):
+        """Forget everything learned from previous positions."""
+        with self.lock:
+            self.tt.clear()
+
+    def search(self, board, time_limit=None, node_limit=None, max_depth=None,
+               stop_event=None, ponder_hit=None):
+        """Search board on every worker and return a SearchResult for the side to move.
+
+        stop_event and ponder_hit (threading.Events) are passed on to the
+        workers as in SearchEngine.search().
+        """
+        time_limit = self.time_limit if time_limit is None else time_limit
+        node_limit = self.node_limit if node_limit is None else node_limit
+        max_depth = self.max_depth if max_depth is None else max_depth
+        if not any(board.generate_legal_moves()):
+            return SearchResult(None, 0, 0, 0, 0.0, [])
+        root = board.root()
+        moves = [move.uci() for move in board.move_stack]
+        with self.lock:
+            start = time.perf_counter()
+            self.search_id += 1
+            self.stop.clear()
+            self.ponder_hit.clear()
+            for tasks in self.tasks:
+                tasks.put((self.search_id, root.fen(), moves, time_limit, node_limit, max_depth,
+                           ponder_hit is not None))
+            replies = []
+            while len(replies) < self.workers:
+                try:
+                    reply = self.results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if not all(process.is_alive() for process in self.processes):
+                        raise RuntimeError("A search worker process died")
+                else:
+                    if reply[0] == self.search_id:
+                        replies.append(reply)
+                        # The first worker to finish ends the search for all of them
+                        self.stop.set()
+                if stop_event is not None and stop_event.is_set():
+                    self.stop.set()
+                if ponder_hit is not None and ponder_hit.is_set():
+                    self.ponder_hit.set()
+            elapsed = time.perf_counter() - start
+
+        # Deepest completed iteration; the lowest worker number breaks ties
+        _, _, move, score, depth, _, pv, source = max(replies, key=lambda reply: (reply[4], -reply[1]))
+        nodes = sum(reply[5] for reply in replies)
+        return SearchResult(chess.Move.from_uci(move) if move else None, score, depth, nodes,
+                            elapsed, [chess.Move.from_uci(uci) for uci in pv], source)
+
+
+def benchmark(worker_counts=WORKER_COUNTS, depth=5, time_limit=1.0, positions=BENCH_POSITIONS):
+    """Time-to-depth and nodes per second of Lazy SMP for each worker count.
+
+    Each position is searched to a fixed depth on an emptied table (time
+    to depth, summed over positions), then for a fixed time (nodes per
+    second). Returns one dict per worker count.
+    """
+    rows = []
+    for workers in worker_counts:
+        engine = ParallelSearchEngine(workers, tt_size=SHARED_TT_SIZE)
+        depth_times = []
+        nps = []
+        for fen in positions:
+            board = chess.Board(fen)
+            engine.new_game()
+            start = time.perf_counter()
+            engine.search(board, time_limit=0, max_depth=depth)
+            depth_times.append(time.perf_counter() - start)
+            engine.new_game()
+            result = engine.search(board, time_limit=time_limit)
+            nps.append(result.nodes / result.elapsed)
+        engine.close()
+        rows.append({"workers": workers, "time_to_depth": sum(depth_times),
+                     "nodes_per_sec": statistics.mean(nps)})
+    for row in rows:
+        row["depth_speedup"] = rows[0]["time_to_depth"] / row["time_to_depth"]
+        row["nps_speedup"] = row["nodes_per_sec"] / rows[0]["nodes_per_sec"]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Lazy SMP scaling over worker processes.")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=list(WORKER_COUNTS),
+                        help="worker counts to compare (default %(default)s)")
+    parser.add_argument("-d", "--depth", type=int, default=5, help="depth for time-to-depth (default %(default)s)")
+    parser.add_argument("-t", "--time", type=float, default=1.0,
+                        help="think time for nodes/s (default %(default)s s)")
+    args = parser.parse_args()
+
+    print(f"{len(BENCH_POSITIONS)} positions, depth {args.depth}, {args.time} s searches, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'time to depth':>14} {'speedup':>8} {'nodes/s':>10} {'speedup':>8}")
+    for row in benchmark(args.workers, args.depth, args.time):
+        print(f"{row['workers']:>7} {row['time_to_depth']:>13.2f}s {row['depth_speedup']:>7.2f}x "
+              f"{row['nodes_per_sec']:>10,.0f} {row['nps_speedup']:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import collections
+import json
+import os
+import threading
+import time
+
+# Constants
+FRAME_WINDOW = 240  # Frames kept for the rolling frame-time percentiles
+
+
+class TraceRecorder:
+    """Record timed phases as Chrome trace events.
+
+    Phases are stored as complete ("X") events with microsecond timestamps
+    relative to the recorder's creation, and write() saves them in the
+    trace-event JSON format read by chrome://tracing and Perfetto.
+    Recording a phase costs one list append.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.thread_names = {}
+
+    def complete(self, name, start, end, category="frame", tid=None, args=None):
+        """Record a phase that ran from start to end (perf_counter() seconds)."""
+        event = {"name": name, "cat": category, "ph": "X", "pid": self.pid,
+                 "tid": tid if tid is not None else threading.get_ident(),
+                 "ts": round((start - self.origin) * 1e6, 1),
+                 "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def counter(self, name, values, when=None):
+        """Record counter values, e.g. {"nodes_per_sec": 12000}, shown as a graph."""
+        when = time.perf_counter() if when is None else when
+        self.events.append({"name": name, "ph": "C", "pid": self.pid,
+                            "ts": round((when - self.origin) * 1e6, 1), "args": values})
+
+    def name_thread(self, tid, name):
+        self.thread_names[tid] = name
+
+    def write(self, path):
+        """Save the recorded events as trace-event JSON."""
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                     "args": {"name": name}} for tid, name in self.thread_names.items()]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+
+
+class NullRecorder:
+    """Stand-in for TraceRecorder when tracing is off; every method does nothing."""
+
+    enabled = False
+
+    def complete(self, name, start, end, category="frame", tid=None, args=None):
+        pass
+
+    def counter(self, name, values, when=None):
+        pass
+
+    def name_thread(self, tid, name):
+        pass
+
+    def write(self, path):
+        pass
+
+
+class FrameStats:
+    """Rolling frame-time percentiles and frames per second."""
+
+    def __init__(self, window=FRAME_WINDOW):
+        self.durations = collections.deque(maxlen=window)
+        self.ends = collections.deque(maxlen=window)
+
+    def add(self, start, end):
+        self.durations.append(end - start)
+        self.ends.append(end)
+
+    def percentile(self, fraction):
+        """Frame time in seconds below which fraction of the recent frames fall."""
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def fps(self, now=None):
+        """Frames drawn during the last second."""
+        now = time.perf_counter() if now is None else now
+        return sum(1 for end in self.ends if now - end <= 1.0)
@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import io
+import os
+import random
+import re
+import sqlite3
+import time
+
+import chess.pgn
+
+# Constants
+INDEX_SUFFIX = '.idx'  # The index of games.pgn is stored in games.pgn.idx
+HEAD_BYTES = 4096  # Prefix hashed to notice when the archive was replaced
+INSERT_BATCH = 10000
+INDEXED_TAGS = ('Event', 'Date', 'White', 'Black', 'Result', 'ECO')
+
+TAG_PATTERN = re.compile(rb'^\[(\w+)\s+"(.*)"\]\s*$')
+
+
+class PGNIndex:
+    """Byte-offset index of a PGN archive, kept in an SQLite file next to it.
+
+    The archive is scanned once, line by line and without parsing any
+    moves, to record where every game starts together with its main
+    header tags. Loading a game then seeks straight to its offset and
+    parses that one game only. When games are appended to the archive,
+    update() resumes scanning from the last indexed game instead of
+    starting over.
+    """
+
+    def __init__(self, pgn_path, index_path=None):
+        self.pgn_path = pgn_path
+        self.index_path = index_path or pgn_path + INDEX_SUFFIX
+        self.db = sqlite3.connect(self.index_path)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS games (
+            number INTEGER PRIMARY KEY, offset INTEGER NOT NULL,
+            event TEXT, date TEXT, white TEXT, black TEXT, result TEXT, eco TEXT)''')
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+        self.db.commit()
+        self.file = None
+        self.load_times = []
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+    def meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def head_hash(self, size):
+        """Hash of the archive's first bytes, up to HEAD_BYTES but never beyond size.
+
+        Capping at the indexed size keeps the hash of a small archive
+        unchanged when games are appended to it.
+        """
+        with open(self.pgn_path, 'rb') as f:
+            return hashlib.sha1(f.read(min(HEAD_BYTES, size))).hexdigest()
+
+    def update(self):
+        """Bring the index up to date with the archive; returns the number of new games."""
+        size = os.path.getsize(self.pgn_path)
+        indexed_size = self.meta('indexed_size', 0)
+        if size < indexed_size or (indexed_size and
+                                   self.head_hash(indexed_size) != self.meta('head_hash')):
+            # The archive was rewritten rather than appended to
+            self.db.execute('DELETE FROM games')
+            indexed_size = 0
+        elif size == indexed_size:
+            return 0
+
+        before = len(self)
+        # The last game may have been incomplete, so rescan it
+        row = self.db.execute('SELECT number, offset FROM games ORDER BY number DESC LIMIT 1').fetchone()
+        if row:
+            number, offset = row
+            self.db.execute('DELETE FROM games WHERE number = ?', (number,))
+        else:
+            number, offset = 1, 0
+
+        batch = []
+        for record in self.scan(offset, number, size):
+            batch.append(record)
+            if len(batch) >= INSERT_BATCH:
+                self.db.executemany('INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+                batch = []
+        self.db.executemany('INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('indexed_size', ?)", (size,))
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('head_hash', ?)", (self.head_hash(size),))
+        self.db.commit()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        return len(self) - before
+
+    def scan(self, offset, number, end):
+        """Yield index rows for the games between offset and end."""
+        tags = None
+        game_offset = None
+        in_headers = False
+        with open(self.pgn_path, 'rb') as f:
+            f.seek(offset)
+            position = offset
+            for line in f:
+                if position >= end:
+                    break  # Appended after update() took the archive's size
+                if line.startswith(b'['):
+                    if not in_headers:
+                        # A header after movetext (or at the start) opens a new game
+                        if tags is not None:
+                            yield self.row(number, game_offset, tags)
+                            number += 1
+                        tags = {}
+                        game_offset = position
+                        in_headers = True
+                    match = TAG_PATTERN.match(line)
+                    if match:
+                        tags[match.group(1).decode('ascii')] = match.group(2).decode('utf-8', 'replace')
+                elif line.strip():
+                    if tags is None:
+                        # Movetext without headers still makes a game
+                        tags = {}
+                        game_offset = position
+                    in_headers = False
+                position += len(line)
+        if tags is not None:
+            yield self.row(number, game_offset, tags)
+
+    def row(self, number, offset, tags):
+        return (number, offset) + tuple(tags.get(tag) for tag in INDEXED_TAGS)
+
+    def headers(self, number):
+        """Return the indexed header tags of a game as a dict."""
+        row = self.db.execute('SELECT event, date, white, black, result, eco FROM games '
+                              'WHERE number = ?', (number,)).fetchone()
+        if row is None:
+            raise KeyError(number)
+        return dict(zip(INDEXED_TAGS, row))
+
+    def find(self, **tags):
+        """Return game numbers whose indexed tags equal the given values, e.g. eco='B90'."""
+        columns = {tag.lower() for tag in INDEXED_TAGS}
+        clauses = []
+        for column in tags:
+            if column not in columns:
+                raise ValueError(f"Not an indexed tag: {column}")
+            clauses.append(f'{column} = ?')
+        query = 'SELECT number FROM games'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        return [row[0] for row in self.db.execute(query + ' ORDER BY number', tuple(tags.values()))]
+
+    def read_game(self, number):
+        """Seek to a game and parse only that game; returns a chess.pgn.Game."""
+        start = time.perf_counter()
+        row = self.db.execute('SELECT offset FROM games WHERE number = ?', (number,)).fetchone()
+        if row is None:
+            raise KeyError(number)
+        end = self.db.execute('SELECT offset FROM games WHERE number = ?', (number + 1,)).fetchone()
+        # The last indexed game ends where the index does, not at text appended since
+        end = end[0] if end else self.meta('indexed_size', 0)
+        if self.file is None:
+            self.file = open(self.pgn_path, 'rb')
+        self.file.seek(row[0])
+        data = self.file.read(end - row[0])
+        game = chess.pgn.read_game(io.StringIO(data.decode('utf-8', 'replace')))
+        self.load_times.append(time.perf_counter() - start)
+        return game
+
+    def load_into(self, game, number, ply=None):
+        """Load a game's position (after ply half-moves, or its end) into a ChessGame."""
+        pgn_game = self.read_game(number)
+        board = pgn_game.board()
+        for i, move in enumerate(pgn_game.mainline_moves()):
+            if ply is not None and i >= ply:
+                break
+            board.push(move)
+        game.set_position(board)
+        return pgn_game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a PGN archive and load games from it.")
+    parser.add_argument("pgn", help="PGN archive")
+    parser.add_argument("--show", type=int, metavar="N", help="print game N")
+    parser.add_argument("--bench", type=int, metavar="COUNT", help="time COUNT random game loads")
+    args = parser.parse_args()
+
+    index = PGNIndex(args.pgn)
+    start = time.perf_counter()
+    added = index.update()
+    elapsed = time.perf_counter() - start
+    print(f"{len(index)} games indexed ({added} new, {elapsed:.2f}s)")
+
+    if args.show is not None:
+        print(index.read_game(args.show))
+
+    if args.bench:
+        rng = random.Random(0)
+        total = len(index)
+        for _ in range(args.bench):
+            index.read_game(rng.randint(1, total))
+        times = sorted(index.load_times)
+        print(f"Random-access load latency over {len(times)} games: "
+              f"median {times[len(times) // 2] * 1e3:.2f} ms, "
+              f"p99 {times[int(len(times) * 0.99)] * 1e3:.2f} ms, "
+              f"max {times[-1] * 1e3:.2f} ms")
+    index.close()
+
+if __name__ == "__main__":
+    main()
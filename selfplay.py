@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import chess
+from chess_core import ChessGameCore
+from chess_engine import SearchEngine, evaluate, load_weights
+from opening_book import OpeningBook
+from game_archive import ArchiveWriter
+
+# Defaults
+DEFAULT_NODE_LIMIT = 2000  # Node budgets keep games reproducible, unlike time limits
+DEFAULT_MAX_PLIES = 300
+DEFAULT_RANDOM_PLIES = 4  # Seeded random opening moves so games differ
+
+# Engine and opening book reused by every game a worker process plays
+_engine = None
+_book = None
+
+def init_worker(node_limit, time_limit, book_path=None, weights_path=None):
+    """Create the per-process engine once, so games don't pay for a new TT."""
+    global _engine, _book
+    _engine = SearchEngine(time_limit=time_limit, node_limit=node_limit,
+                           evaluate=load_weights(weights_path) if weights_path else evaluate)
+    _book = OpeningBook(book_path) if book_path else None
+
+def play_game(index, seed, random_plies, max_plies):
+    """Play one AI vs AI game and return its result record."""
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    _engine.new_game()  # Keep each game independent of scheduling order
+
+    if _book is not None:
+        _book.rng.seed(seed)
+    # No tablebase: a syzygy/ directory in the working directory would change the games
+    game = ChessGameCore(engine=_engine, book=_book or False, tablebase=False)
+    nodes = 0
+    while not game.game_over and len(game.board.move_stack) < max_plies:
+        # Both sides are played by the AI, so hand it whichever side is to move
+        game.ai_color = game.board.turn
+        if len(game.board.move_stack) < random_plies:
+            move = rng.choice(list(game.board.legal_moves))
+            game.make_move(move.from_square, move.to_square)
+        else:
+            game.ai_move()
+            nodes += game.last_search.nodes
+
+    return {
+        "game": index,
+        "seed": seed,
+        "result": game.outcome.result,
+        "termination": game.game_result or "Ply limit reached",
+        "plies": len(game.board.move_stack),
+        "nodes": nodes,
+        "seconds": round(time.perf_counter() - start, 4),
+        "moves": [move.uci() for move in game.board.move_stack],
+    }
+
+def run(games, workers, seed, output, node_limit=DEFAULT_NODE_LIMIT, time_limit=None,
+        random_plies=DEFAULT_RANDOM_PLIES, max_plies=DEFAULT_MAX_PLIES, book_path=None,
+        archive_path=None, weights_path=None):
+    """Play games across a process pool, streaming results to output as JSON lines.
+
+    If archive_path is given, finished games are also appended to that
+    binary game archive. weights_path selects an evaluation weights file
+    from texel_tuning.py instead of the built-in tables.
+
+    Returns a summary dict with throughput and win/draw counts.
+    """
+    counts = {"1-0": 0, "0-1": 0, "1/2-1/2": 0, "*": 0}
+    total_plies = 0
+    start = time.perf_counter()
+    archive = ArchiveWriter(archive_path) if archive_path else None
+
+    with open(output, "w") as out, \
+         ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(node_limit, time_limit, book_path, weights_path)) as pool:
+        futures = [pool.submit(play_game, i, seed + i, random_plies, max_plies)
+                   for i in range(games)]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if archive is not None:
+                archive.append([chess.Move.from_uci(move) for move in record["moves"]],
+                               record["result"], record["game"])
+            counts[record["result"]] += 1
+            total_plies += record["plies"]
+            elapsed = time.perf_counter() - start
+            print(f"[{done}/{games}] game {record['game']}: {record['result']} "
+                  f"in {record['plies']} plies ({done / elapsed:.2f} games/s)")
+
+    if archive is not None:
+        archive.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "games": games,
+        "workers": workers,
+        "seconds": elapsed,
+        "games_per_sec": games / elapsed,
+        "plies_per_sec": total_plies / elapsed,
+        "white_wins": counts["1-0"],
+        "black_wins": counts["0-1"],
+        "draws": counts["1/2-1/2"],
+        "unfinished": counts["*"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AI vs AI games in parallel.")
+    parser.add_argument("-n", "--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game; game i uses seed + i")
+    parser.add_argument("-o", "--output", default="selfplay.jsonl", help="JSON lines file for results")
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODE_LIMIT, help="search node budget per move")
+    parser.add_argument("--time", type=float, default=None,
+                        help="search time budget per move in seconds (not reproducible)")
+    parser.add_argument("--random-plies", type=int, default=DEFAULT_RANDOM_PLIES,
+                        help="seeded random moves at the start of each game")
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES,
+                        help="stop a game unfinished after this many plies")
+    parser.add_argument("--archive", default=None, help="also append games to this binary game archive")
+    parser.add_argument("--book", default=None, help="Polyglot opening book for the AI (seeded per game)")
+    parser.add_argument("--weights", default=None, help="evaluation weights from texel_tuning.py")
+    args = parser.parse_args()
+
+    summary = run(args.games, args.workers, args.seed, args.output, node_limit=args.nodes,
+                  time_limit=args.time, random_plies=args.random_plies, max_plies=args.max_plies,
+                  book_path=args.book, archive_path=args.archive, weights_path=args.weights)
+
+    total = summary["games"]
+    print(f"\n{total} games with {summary['workers']} workers in {summary['seconds']:.1f}s")
+    print(f"{summary['games_per_sec']:.2f} games/s, {summary['plies_per_sec']:.1f} plies/s")
+    print(f"White wins: {summary['white_wins']} ({100 * summary['white_wins'] / total:.1f}%), "
+          f"Black wins: {summary['black_wins']} ({100 * summary['black_wins'] / total:.1f}%), "
+          f"Draws: {summary['draws']} ({100 * summary['draws'] / total:.1f}%), "
+          f"Unfinished: {summary['unfinished']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import collections
+import os
+import time
+
+import chess
+import chess.polyglot
+import chess.syzygy
+
+# Constants
+TABLEBASE_PATH = 'syzygy'  # Directory of .rtbw/.rtbz files, used when present
+PROBE_CACHE_SIZE = 1 << 16  # Cached probe results per table type
+
+
+class Tablebase:
+    """Syzygy WDL/DTZ probing with a bounded LRU cache of probe results.
+
+    Results are cached by Zobrist key, so a search that reaches the same
+    endgame position many times only reads the table files once. Counters
+    track cache hits, misses (actual file probes) and time spent probing.
+    """
+
+    def __init__(self, directory, cache_size=PROBE_CACHE_SIZE):
+        self.tables = chess.syzygy.open_tablebase(directory)
+        # Tables are named after their material, e.g. KRvKP
+        names = list(self.tables.wdl) + list(self.tables.dtz)
+        self.max_pieces = max((len(name) - 1 for name in names), default=0)
+        self.cache_size = cache_size
+        self.wdl_cache = collections.OrderedDict()
+        self.dtz_cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.probe_time = 0.0
+
+    def close(self):
+        self.tables.close()
+
+    def covers(self, board):
+        """True if board has few enough pieces to be in the loaded tables."""
+        return (chess.popcount(board.occupied) <= self.max_pieces
+                and not board.castling_rights)
+
+    def probe_wdl(self, board, key=None):
+        """Return the WDL value (-2..2) for the side to move, or None if unavailable."""
+        return self._probe(board, key, self.wdl_cache, self.tables.probe_wdl)
+
+    def probe_dtz(self, board, key=None):
+        """Return the DTZ value for the side to move, or None if unavailable."""
+        return self._probe(board, key, self.dtz_cache, self.tables.probe_dtz)
+
+    def _probe(self, board, key, cache, probe):
+        if key is None:
+            key = chess.polyglot.zobrist_hash(board)
+        if key in cache:
+            cache.move_to_end(key)
+            self.hits += 1
+            return cache[key]
+        self.misses += 1
+        start = time.perf_counter()
+        try:
+            value = probe(board)
+        except (KeyError, chess.syzygy.MissingTableError):
+            value = None
+        self.probe_time += time.perf_counter() - start
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def best_move(self, board):
+        """Return the move that keeps the best WDL value and makes progress by DTZ.
+
+        Winning moves are ranked by how quickly they reset the fifty-move
+        counter (zeroing moves first, then the smallest DTZ); losing moves
+        by how long they hold out. Returns (move, wdl) or (None, None) if any
+        reply cannot be probed.
+        """
+        best = None
+        best_rank = None
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    return move, 2
+                wdl = self.probe_wdl(board)
+                dtz = self.probe_dtz(board)
+            finally:
+                board.pop()
+            if wdl is None or dtz is None:
+                return None, None
+            value = -wdl
+            if value > 0:
+                progress = -1 if zeroing else abs(dtz)
+                rank = (value, -progress)
+            else:
+                rank = (value, abs(dtz))
+            if best_rank is None or rank > best_rank:
+                best = (move, value)
+                best_rank = rank
+        return best if best is not None else (None, None)
+
+    def stats(self):
+        """Return probe counters as a dict."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "probe_ms": round(self.probe_time * 1000, 3),
+            "cached": len(self.wdl_cache) + len(self.dtz_cache),
+        }
+
+
+def load_default_tablebase():
+    """Return a Tablebase for TABLEBASE_PATH, or None if there are no tables there."""
+    if os.path.isdir(TABLEBASE_PATH):
+        tablebase = Tablebase(TABLEBASE_PATH)
+        if tablebase.max_pieces:
+            return tablebase
+        tablebase.close()
+    return None
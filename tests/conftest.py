@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYZYGY_PATH = os.path.join(ROOT, 'tests', 'syzygy')  # KQvK, KRvK and KPvK from python-chess's test data
+
+# The modules live at the top of the repository
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def tablebase():
+    from tablebase import Tablebase
+    tablebase = Tablebase(SYZYGY_PATH)
+    yield tablebase
+    tablebase.close()
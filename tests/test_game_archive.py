@@ -0,0 +1,52 @@
+import collections
+import random
+
+import chess
+
+from game_archive import ArchiveReader, ArchiveWriter
+
+
+def random_game(rng, plies):
+    board = chess.Board()
+    while len(board.move_stack) < plies:
+        moves = list(board.legal_moves)
+        if not moves:
+            board.pop()
+            continue
+        board.push(rng.choice(moves))
+    return board.move_stack
+
+
+def test_sample_is_uniform_over_positions(tmp_path):
+    rng = random.Random(0)
+    path = str(tmp_path / 'games.cga')
+    with ArchiveWriter(path) as writer:
+        writer.append(random_game(rng, 2))
+        writer.append(random_game(rng, 197))
+    reader = ArchiveReader(path)
+    samples = reader.sample(40000, random.Random(1))
+    reader.close()
+
+    games = collections.Counter(index for index, _ in samples)
+    # 3 of the 201 positions are in the short game; picking a game first would give half
+    assert abs(games[0] / len(samples) - 3 / 201) < 0.005
+    short = collections.Counter(ply for index, ply in samples if index == 0)
+    long = collections.Counter(ply for index, ply in samples if index == 1)
+    assert set(short) == {0, 1, 2}
+    assert set(long) == set(range(198))
+    # Each position is drawn about 40000 / 201 = 199 times
+    assert all(120 < n < 280 for n in list(short.values()) + list(long.values()))
+
+
+def test_sample_positions_replay(tmp_path):
+    rng = random.Random(2)
+    path = str(tmp_path / 'games.cga')
+    games = [random_game(rng, plies) for plies in (0, 5, 40)]
+    with ArchiveWriter(path) as writer:
+        for moves in games:
+            writer.append(moves)
+    reader = ArchiveReader(path)
+    for index, ply in reader.sample(200, rng):
+        assert 0 <= ply <= len(games[index])
+        assert reader.board(index, ply).move_stack == games[index][:ply]
+    reader.close()
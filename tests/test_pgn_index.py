@@ -0,0 +1,60 @@
+from pgn_index import PGNIndex
+
+GAMES = [
+    '[Event "First"]\n[White "A"]\n[Black "B"]\n[Result "1-0"]\n\n1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0\n\n',
+    '[Event "Second"]\n[White "C"]\n[Black "D"]\n[Result "1/2-1/2"]\n\n1. d4 d5 1/2-1/2\n\n',
+    '[Event "Third"]\n[White "E"]\n[Black "F"]\n[Result "0-1"]\n\n1. f3 e5 2. g4 Qh4# 0-1\n\n',
+]
+
+
+def write(path, *games, mode='w'):
+    with open(path, mode) as f:
+        f.write(''.join(games))
+
+
+def test_append_to_small_archive_is_incremental(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    write(path, *GAMES[:2])
+    index = PGNIndex(path)
+    assert index.update() == 2
+
+    # The archive is far below HEAD_BYTES, so appending changes its first bytes' hash
+    write(path, GAMES[2], mode='a')
+    assert index.update() == 1
+    assert len(index) == 3
+    assert [index.headers(number)['Event'] for number in (1, 2, 3)] == ['First', 'Second', 'Third']
+    assert index.update() == 0
+    index.close()
+
+
+def test_rewritten_archive_is_rescanned(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    write(path, *GAMES[:2])
+    index = PGNIndex(path)
+    index.update()
+    write(path, GAMES[2], GAMES[0], GAMES[1])
+    assert index.update() == 3  # Rescanned from the start, so every game is new
+    assert index.headers(1)['Event'] == 'Third'
+    index.close()
+
+
+def test_last_game_read_stops_at_indexed_size(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    write(path, *GAMES[:2])
+    index = PGNIndex(path)
+    index.update()
+    write(path, GAMES[2], mode='a')  # Not indexed yet
+    index.file = open(path, 'rb')
+    reads = []
+    read = index.file.read
+
+    def counting_read(size=-1):
+        data = read(size)
+        reads.append(len(data))
+        return data
+
+    index.file.read = counting_read
+    game = index.read_game(2)
+    assert game.headers['Event'] == 'Second'
+    assert reads == [len(GAMES[1])]
+    index.close()
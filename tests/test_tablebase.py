@@ -0,0 +1,138 @@
+import os
+
+import chess
+
+from chess_engine import MATE_SCORE, TB_WIN_SCORE, SearchEngine
+from tablebase import Tablebase
+
+SYZYGY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'syzygy')
+
+
+def replies(tablebase, board):
+    """(move, wdl for the mover, dtz for the opponent) of every legal move."""
+    values = []
+    for move in board.legal_moves:
+        board.push(move)
+        values.append((move, -tablebase.probe_wdl(board), tablebase.probe_dtz(board)))
+        board.pop()
+    return values
+
+
+def test_max_pieces_comes_from_table_names(tablebase):
+    assert tablebase.max_pieces == 3
+
+
+def test_covers(tablebase):
+    assert tablebase.covers(chess.Board("7k/8/8/8/8/8/8/KQ6 w - - 0 1"))
+    # Four pieces is more than the loaded tables have
+    assert not tablebase.covers(chess.Board("7k/8/8/8/3n4/8/8/K2Q4 w - - 0 1"))
+    # Syzygy tables assume no castling rights
+    assert not tablebase.covers(chess.Board("4k3/8/8/8/8/8/8/R3K3 w Q - 0 1"))
+    assert not tablebase.covers(chess.Board())
+
+
+def test_probe_values(tablebase):
+    assert tablebase.probe_wdl(chess.Board("7k/8/8/8/8/8/8/KQ6 w - - 0 1")) == 2
+    assert tablebase.probe_wdl(chess.Board("7k/8/8/8/8/8/8/KQ6 b - - 0 1")) == -2
+    # Missing tables read as unavailable rather than raising
+    assert tablebase.probe_wdl(chess.Board("7k/8/6n1/8/8/8/8/K2Q4 w - - 0 1")) is None
+
+
+def test_best_move_plays_mate_in_one(tablebase):
+    board = chess.Board("7k/8/5K2/8/8/8/8/6Q1 w - - 0 1")
+    assert tablebase.best_move(board) == (chess.Move.from_uci("g1g7"), 2)
+
+
+def test_best_move_prefers_wins_then_zeroing_moves(tablebase):
+    # Every move wins except d2d4; the quickest king moves have DTZ 2,
+    # but the pawn move resets the fifty-move counter
+    board = chess.Board("k7/8/8/8/8/8/3PK3/8 w - - 0 1")
+    move, wdl = tablebase.best_move(board)
+    assert wdl == 2
+    assert move == chess.Move.from_uci("d2d3")
+
+
+def test_best_move_wins_by_smallest_dtz(tablebase):
+    board = chess.Board("7k/8/8/8/8/8/4P3/4K3 w - - 0 1")
+    move, wdl = tablebase.best_move(board)
+    values = replies(tablebase, board)
+    fastest = min(abs(dtz) for _, value, dtz in values if value == 2)
+    assert wdl == 2
+    assert (move, 2, -fastest) in values
+    assert not board.is_zeroing(move)  # The pawn moves only draw here
+
+
+def test_best_move_draws_rather_than_loses(tablebase):
+    # Capturing the rook draws; every other king move loses
+    board = chess.Board("8/8/8/8/8/2k5/2R5/4K3 b - - 0 1")
+    assert tablebase.best_move(board) == (chess.Move.from_uci("c3c2"), 0)
+
+
+def test_best_move_loses_slowest(tablebase):
+    board = chess.Board("8/8/8/8/8/2k5/8/KQ6 b - - 0 1")
+    move, wdl = tablebase.best_move(board)
+    values = replies(tablebase, board)
+    assert wdl == -2
+    assert all(value == -2 for _, value, _ in values)
+    assert abs(dict((m, dtz) for m, _, dtz in values)[move]) == max(abs(dtz) for _, _, dtz in values)
+
+
+def test_best_move_without_tables(tablebase):
+    assert tablebase.best_move(chess.Board("7k/8/8/8/3n4/8/8/K2Q4 w - - 0 1")) == (None, None)
+
+
+def test_probe_cache_is_lru_and_counted():
+    tablebase = Tablebase(SYZYGY_PATH, cache_size=2)
+    first, second, third = (chess.Board(fen) for fen in (
+        "7k/8/8/8/8/8/8/KQ6 w - - 0 1",
+        "7k/8/8/8/8/8/8/KR6 w - - 0 1",
+        "7k/8/8/8/8/8/P7/K7 w - - 0 1",
+    ))
+    tablebase.probe_wdl(first)
+    tablebase.probe_wdl(second)
+    tablebase.probe_wdl(first)  # Hit; second is now the least recently used
+    tablebase.probe_wdl(third)  # Evicts second
+    stats = tablebase.stats()
+    assert (stats["hits"], stats["misses"], stats["cached"]) == (1, 3, 2)
+
+    tablebase.probe_wdl(first)
+    tablebase.probe_wdl(second)
+    stats = tablebase.stats()
+    assert (stats["hits"], stats["misses"], stats["cached"]) == (2, 4, 2)
+    # WDL and DTZ results are cached separately
+    tablebase.probe_dtz(first)
+    assert tablebase.stats()["misses"] == 5
+    assert tablebase.stats()["cached"] == 3
+    tablebase.close()
+
+
+def test_engine_plays_tablebase_move_at_root(tablebase):
+    engine = SearchEngine(tablebase=tablebase)
+    result = engine.search(chess.Board("8/8/8/8/8/2k5/2R5/4K3 b - - 0 1"))
+    assert result.source == "tablebase"
+    assert result.move == chess.Move.from_uci("c3c2")
+    assert (result.score, result.nodes) == (0, 0)
+
+    result = engine.search(chess.Board("k7/8/8/8/8/8/3PK3/8 w - - 0 1"))
+    assert result.source == "tablebase"
+    assert result.score == TB_WIN_SCORE
+
+    result = engine.search(chess.Board("8/8/8/8/8/2k5/8/KQ6 b - - 0 1"))
+    assert result.score == -TB_WIN_SCORE
+
+
+def test_engine_scores_tablebase_positions_inside_the_search(tablebase):
+    # Four pieces, so the root is searched; taking the knight reaches KQvK
+    board = chess.Board("7k/8/8/8/3n4/8/8/K2Q4 w - - 0 1")
+    engine = SearchEngine(tablebase=tablebase, time_limit=None, max_depth=2)
+    result = engine.search(board)
+    assert result.source != "tablebase"
+    assert result.move == chess.Move.from_uci("d1d4")
+    # A tablebase win one ply from the root, not a mate score or an evaluation
+    assert result.score == TB_WIN_SCORE - 1
+    assert result.score < MATE_SCORE - 100
+    assert tablebase.stats()["misses"] > 0
+
+    # Without tables the same search only sees material
+    plain = SearchEngine(time_limit=None, max_depth=2).search(board)
+    assert plain.score < TB_WIN_SCORE - 100
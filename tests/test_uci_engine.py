@@ -0,0 +1,158 @@
+import subprocess
+import threading
+import time
+
+import chess
+import chess.engine
+import pytest
+
+from ai_worker import AIWorker, SearchError
+from chess_core import ChessGameCore
+from chess_engine import MAX_PLY, SearchEngine
+from uci_engine import MAX_ATTEMPTS, STAND_IN_COMMAND, UCI_TIME_LIMIT, UCIEngine, parse_go
+
+
+@pytest.fixture
+def open_engine():
+    """Start UCIEngines on the stand-in (with extra serve arguments) and close them afterwards."""
+    engines = []
+
+    def open_engine(*arguments, **options):
+        engine = UCIEngine(STAND_IN_COMMAND + list(arguments), **options)
+        engines.append(engine)
+        return engine
+
+    yield open_engine
+    for engine in engines:
+        engine.close()
+
+
+class FailingEngine:
+    def search(self, board, **limits):
+        raise RuntimeError("engine exploded")
+
+
+def search_in_thread(engine, board, **limits):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(engine.search(board, **limits)))
+    thread.start()
+    return thread, results
+
+
+def test_search(open_engine):
+    engine = open_engine(time_limit=0.1)
+    board = chess.Board()
+    result = engine.search(board)
+    assert result.move in board.legal_moves
+    assert result.source == "uci"
+    assert result.depth > 0 and result.nodes > 0
+    assert result.pv[0] == result.move
+    # The process is reused for the next search
+    engine.search(board)
+    assert (engine.starts, engine.restarts) == (1, 0)
+
+
+def test_search_without_legal_moves(open_engine):
+    engine = open_engine(time_limit=0.1)
+    assert engine.search(chess.Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")).move is None
+
+
+def test_stop_event_ends_search(open_engine):
+    engine = open_engine(time_limit=30)
+    board = chess.Board()
+    stop_event = threading.Event()
+    threading.Timer(0.3, stop_event.set).start()
+    start = time.perf_counter()
+    result = engine.search(board, stop_event=stop_event)
+    assert time.perf_counter() - start < 5
+    assert result.move in board.legal_moves
+
+
+def test_ponder_hit(open_engine):
+    engine = open_engine(time_limit=0.2)
+    board = chess.Board()
+    ponder_hit = threading.Event()
+    thread, results = search_in_thread(engine, board, ponder_hit=ponder_hit)
+    # A ponder search ignores the time limit until the hit
+    thread.join(1.0)
+    assert thread.is_alive()
+    ponder_hit.set()
+    # It has already thought longer than the time limit, so it answers at once
+    thread.join(5)
+    assert not thread.is_alive()
+    assert results[0].move in board.legal_moves
+    assert results[0].elapsed >= 1.0
+
+
+def test_restart_after_crash(open_engine):
+    # Every stand-in process dies during its second search
+    engine = open_engine('--crash-after', '2', time_limit=0.1)
+    board = chess.Board()
+    assert engine.search(board).move in board.legal_moves
+    result = engine.search(board)
+    assert result.move in board.legal_moves
+    assert (engine.starts, engine.restarts) == (2, 1)
+
+
+def test_search_fails_after_last_attempt(open_engine):
+    engine = open_engine('--crash-after', '1', time_limit=0.1)
+    with pytest.raises(chess.engine.EngineError):
+        engine.search(chess.Board())
+    assert engine.restarts == MAX_ATTEMPTS - 1
+
+
+def test_worker_reports_search_errors():
+    worker = AIWorker(FailingEngine())
+    worker.start(chess.Board())
+    worker.thread.join()
+    with pytest.raises(SearchError, match="engine exploded") as error:
+        worker.poll()
+    assert isinstance(error.value.__cause__, RuntimeError)
+    assert worker.poll() is None
+
+
+def test_game_falls_back_to_built_in_engine(open_engine):
+    engine = open_engine('--crash-after', '1', time_limit=0.1)
+    game = ChessGameCore(engine=engine, async_ai=True, book=False, tablebase=False)
+    game.player_color, game.ai_color = chess.BLACK, chess.WHITE
+    game.request_ai_move()
+    deadline = time.perf_counter() + 30
+    while not game.update():
+        assert time.perf_counter() < deadline
+        if game.engine_error is not None and game.ply == 0:
+            assert "built-in engine" in game.status_message
+        time.sleep(0.01)
+    assert isinstance(game.engine_error, SearchError)
+    assert isinstance(game.engine, SearchEngine)
+    assert game.ply == 1 and game.last_search.source != "uci"
+    game.shutdown()
+
+
+def test_parse_go_default_time():
+    assert parse_go([], chess.WHITE) == (UCI_TIME_LIMIT, None, MAX_PLY)
+    assert parse_go([], chess.WHITE, 0.25) == (0.25, None, MAX_PLY)
+    # Explicit limits still win over the default
+    assert parse_go(['movetime', '500'], chess.WHITE, 0.25)[0] == 0.5
+    assert parse_go(['depth', '3'], chess.BLACK, 0.25) == (0, None, 3)
+
+
+def test_serve_time_applies_to_unlimited_go():
+    process = subprocess.Popen(STAND_IN_COMMAND + ['--time', '0.3'], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        process.stdin.write("uci\nisready\n")
+        process.stdin.flush()
+        while process.stdout.readline().strip() != "readyok":
+            pass
+        start = time.perf_counter()
+        process.stdin.write("position startpos\ngo\n")
+        process.stdin.flush()
+        while not process.stdout.readline().startswith("bestmove"):
+            pass
+        elapsed = time.perf_counter() - start
+    finally:
+        process.stdin.write("quit\n")
+        process.stdin.close()
+        process.wait(10)
+    # The module default would think for UCI_TIME_LIMIT (1 s)
+    assert 0.25 < elapsed < 0.8
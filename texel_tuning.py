@@ -0,0 +1,248 @@
+import argparse
+import json
+import math
+import os
+import time
+
+import chess
+import numpy as np
+
+from chess_engine import EVAL_WEIGHTS_PATH
+from evaluation import PLANES, default_weights, unpack
+from game_archive import ArchiveReader, decode_move
+
+# Constants
+SKIP_PLIES = 8  # Opening positions, mostly book or random moves, are left out
+BATCH_SIZE = 4096
+CHUNK_SIZE = 1 << 18  # Positions read from the memory map at a time, 24 MB
+WRITE_BATCH = 1 << 16  # Positions buffered while building a dataset
+K_SAMPLE = 1 << 20  # Positions the sigmoid scale is fitted on
+LEARNING_RATE = 1.0  # Adam step size, in centipawns
+EPOCHS = 10
+K_RANGE = (0.2, 3.0)  # Search interval for the sigmoid scale
+RESULT_VALUES = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}  # From white's point of view
+LOG10_400 = math.log(10) / 400
+
+
+def sigmoid(scores, k):
+    """Expected result for white of centipawn scores: 1 / (1 + 10^(-k * score / 400))."""
+    # Clipped so lopsided material can't overflow float32; the result is 0 or 1 there anyway
+    return 1.0 / (1.0 + np.power(10.0, np.clip(-k * scores / 400.0, -30, 30)))
+
+
+def labeled_games(path):
+    """Yield (moves, result) for the finished games of an archive or self-play JSON lines file."""
+    if path.endswith('.jsonl'):
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                yield [chess.Move.from_uci(move) for move in record["moves"]], record["result"]
+    else:
+        reader = ArchiveReader(path)
+        for index in range(len(reader)):
+            _, _, result = reader.header(index)
+            codes = reader.moves(index)
+            moves = [decode_move(code) for code in codes]
+            codes.release()
+            yield moves, result
+        reader.close()
+
+
+def build_dataset(sources, directory, skip_plies=SKIP_PLIES):
+    """Replay games into packed positions on disk; returns the number of positions.
+
+    Every position from skip_plies on is stored as its 12 piece bitboards
+    (96 bytes, the encoding of evaluation.encode()) in planes.bin, with
+    its game's result for white in labels.bin. Unfinished games are
+    skipped. Files are written in chunks, so the dataset never has to fit
+    in memory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    with open(os.path.join(directory, 'planes.bin'), 'wb') as planes_file, \
+         open(os.path.join(directory, 'labels.bin'), 'wb') as labels_file:
+        planes = []
+        labels = []
+        for path in sources:
+            for moves, result in labeled_games(path):
+                if result not in RESULT_VALUES:
+                    continue
+                board = chess.Board()
+                for ply, move in enumerate(moves, 1):
+                    board.push(move)
+                    if ply >= skip_plies:
+                        planes.append([board.pieces_mask(piece_type, color) for color, piece_type in PLANES])
+                        labels.append(RESULT_VALUES[result])
+                if len(planes) >= WRITE_BATCH:
+                    planes_file.write(np.array(planes, dtype='<u8').tobytes())
+                    labels_file.write(np.array(labels, dtype='<f4').tobytes())
+                    count += len(planes)
+                    planes, labels = [], []
+        planes_file.write(np.array(planes, dtype='<u8').reshape(-1, len(PLANES)).tobytes())
+        labels_file.write(np.array(labels, dtype='<f4').tobytes())
+        count += len(planes)
+    return count
+
+
+def open_dataset(directory):
+    """Memory-map a dataset written by build_dataset(); returns (planes, labels)."""
+    planes = np.memmap(os.path.join(directory, 'planes.bin'), dtype='<u8', mode='r')
+    labels = np.memmap(os.path.join(directory, 'labels.bin'), dtype='<f4', mode='r')
+    return planes.reshape(-1, len(PLANES)), labels
+
+
+def features(planes):
+    """Turn (N, 12) bitboards into the (N, 384) features the evaluation is linear in.
+
+    Feature p * 64 + s is +1 for a white piece of type p on s and -1 for
+    a black one on the mirror of s, so features @ weights is the white
+    point-of-view score of evaluation.Evaluator. Mirroring a bitboard
+    vertically reverses its bytes, so black's planes are byte-swapped
+    before unpacking instead of gathering squares afterwards.
+    """
+    planes = np.array(planes, dtype='<u8')
+    planes[:, 6:] = planes[:, 6:].byteswap()
+    occupancy = unpack(planes).view(np.int8)
+    return (occupancy[:, :6] - occupancy[:, 6:]).reshape(len(planes), 6 * 64).astype(np.float32)
+
+
+class TexelTuner:
+    """Fit piece-square weights to game results by minimizing sigmoid-scaled error.
+
+    The error of a position is (result - sigmoid(k * score))^2. Its
+    gradient for a whole mini-batch is two matrix-vector products, so
+    nothing loops over positions in Python. Data is read from the
+    memory-mapped dataset one chunk at a time, shuffled within the chunk,
+    and the chunks are visited in random order, so the dataset can be
+    larger than RAM. Steps use Adam.
+    """
+
+    def __init__(self, planes, labels, weights=None, batch_size=BATCH_SIZE,
+                 learning_rate=LEARNING_RATE, k=None, seed=0):
+        self.planes = planes
+        self.labels = labels
+        self.weights = (default_weights() if weights is None else np.asarray(weights)).astype(np.float64).ravel()
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.rng = np.random.default_rng(seed)
+        self.moment = np.zeros_like(self.weights)
+        self.velocity = np.zeros_like(self.weights)
+        self.steps = 0
+        self.k = self.fit_k() if k is None else k
+
+    def batches(self, shuffle=False):
+        """Yield (features, labels) mini-batches, reading CHUNK_SIZE positions at a time."""
+        starts = np.arange(0, len(self.labels), CHUNK_SIZE)
+        if shuffle:
+            self.rng.shuffle(starts)
+        for start in starts:
+            planes = np.asarray(self.planes[start:start + CHUNK_SIZE])
+            labels = np.asarray(self.labels[start:start + CHUNK_SIZE], dtype=np.float32)
+            if shuffle:
+                order = self.rng.permutation(len(labels))
+                planes, labels = planes[order], labels[order]
+            for begin in range(0, len(labels), self.batch_size):
+                yield (features(planes[begin:begin + self.batch_size]),
+                       labels[begin:begin + self.batch_size])
+
+    def scores(self, x):
+        return x @ self.weights.astype(np.float32)
+
+    def error(self):
+        """Mean squared error over the whole dataset."""
+        total = 0.0
+        for x, labels in self.batches():
+            total += np.square(labels - sigmoid(self.scores(x), self.k)).sum(dtype=np.float64)
+        return total / len(self.labels)
+
+    def fit_k(self, low=K_RANGE[0], high=K_RANGE[1], iterations=20):
+        """Golden-section search for the sigmoid scale that best fits the current weights.
+
+        Fitted on up to K_SAMPLE positions spread evenly over the dataset.
+        """
+        sample = np.unique(np.linspace(0, len(self.labels) - 1, min(K_SAMPLE, len(self.labels)),
+                                       dtype=np.int64))
+        scores = np.concatenate([self.scores(features(self.planes[sample[i:i + self.batch_size]]))
+                                 for i in range(0, len(sample), self.batch_size)])
+        labels = np.asarray(self.labels[sample], dtype=np.float32)
+
+        def error(k):
+            return np.square(labels - sigmoid(scores, k)).mean()
+
+        ratio = (math.sqrt(5) - 1) / 2
+        a, b = low, high
+        for _ in range(iterations):
+            c = b - ratio * (b - a)
+            d = a + ratio * (b - a)
+            if error(c) < error(d):
+                b = d
+            else:
+                a = c
+        return (a + b) / 2
+
+    def step(self, x, labels, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        """One Adam step on a mini-batch; returns the batch's error before the step."""
+        predicted = sigmoid(self.scores(x), self.k)
+        residual = predicted - labels
+        # d/dw of mean((p - r)^2) with dp/dscore = k * ln(10) / 400 * p * (1 - p)
+        gradient = x.T @ (residual * predicted * (1 - predicted)) * (2 * self.k * LOG10_400 / len(labels))
+        self.steps += 1
+        self.moment = beta1 * self.moment + (1 - beta1) * gradient
+        self.velocity = beta2 * self.velocity + (1 - beta2) * np.square(gradient)
+        moment = self.moment / (1 - beta1 ** self.steps)
+        velocity = self.velocity / (1 - beta2 ** self.steps)
+        self.weights -= self.learning_rate * moment / (np.sqrt(velocity) + epsilon)
+        return np.square(residual).mean()
+
+    def epoch(self):
+        """One pass over the dataset in shuffled mini-batches; returns (mean error, positions/s)."""
+        start = time.perf_counter()
+        total = 0.0
+        for x, labels in self.batches(shuffle=True):
+            total += self.step(x, labels) * len(labels)
+        return float(total / len(self.labels)), len(self.labels) / (time.perf_counter() - start)
+
+    def table(self):
+        """Current weights rounded to a (6, 64) integer table, pawn to king."""
+        return np.rint(self.weights).astype(np.int64).reshape(6, 64)
+
+    def save(self, path, **info):
+        """Write the weights as JSON for chess_engine.load_weights()."""
+        with open(path, 'w') as f:
+            json.dump({"weights": self.table().tolist(), "k": round(self.k, 4), **info}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune evaluation weights on game results (Texel's method).")
+    parser.add_argument("dataset", help="dataset directory (planes.bin and labels.bin)")
+    parser.add_argument("--build", nargs="+", metavar="GAMES",
+                        help="first build the dataset from game archives or self-play .jsonl files")
+    parser.add_argument("--skip-plies", type=int, default=SKIP_PLIES,
+                        help="leave out the first plies of each game (default %(default)s)")
+    parser.add_argument("-e", "--epochs", type=int, default=EPOCHS)
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE, help="Adam step size in centipawns")
+    parser.add_argument("-k", type=float, default=None, help="sigmoid scale (default: fitted to the data)")
+    parser.add_argument("-o", "--output", default=EVAL_WEIGHTS_PATH,
+                        help="weights file the engine loads (default %(default)s)")
+    args = parser.parse_args()
+
+    if args.build:
+        start = time.perf_counter()
+        count = build_dataset(args.build, args.dataset, args.skip_plies)
+        print(f"Built {count:,} positions in {time.perf_counter() - start:.1f}s")
+
+    planes, labels = open_dataset(args.dataset)
+    tuner = TexelTuner(planes, labels, batch_size=args.batch_size, learning_rate=args.lr, k=args.k)
+    initial = tuner.error()
+    print(f"{len(labels):,} positions, k = {tuner.k:.3f}, initial error {initial:.5f}")
+    for epoch in range(1, args.epochs + 1):
+        error, rate = tuner.epoch()
+        print(f"epoch {epoch:>3}: error {error:.5f}, {rate:,.0f} positions/s")
+    final = tuner.error()
+    print(f"Final error {final:.5f} (was {initial:.5f})")
+    tuner.save(args.output, positions=len(labels), error=final, epochs=args.epochs)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import os
+import shlex
+import statistics
+import sys
+import threading
+import time
+
+import chess
+import chess.engine
+
+from chess_engine import MATE_SCORE, MATE_THRESHOLD, MAX_PLY, SearchEngine, SearchResult
+
+# Constants
+UCI_TIME_LIMIT = 1.0  # Default think time per move in seconds
+POLL_INTERVAL = 0.01  # Seconds between checks of the caller's stop and ponder events
+HANG_GRACE = 5.0  # Seconds past the time limit before a silent engine counts as hung
+MAX_ATTEMPTS = 2  # A failed search is run once more on a restarted engine
+STAND_IN_COMMAND = [sys.executable, os.path.abspath(__file__), 'serve']
+
+
+class UCIEngine:
+    """Search with an external UCI engine kept running in one process.
+
+    The engine is started once and driven through python-chess's asyncio
+    chess.engine API on an event loop in a daemon thread, so no process
+    is spawned per move. search() has the same interface as
+    SearchEngine.search() and blocks only its caller (the AIWorker thread
+    in the GUI) while the loop talks to the engine. If the process dies,
+    or stops answering HANG_GRACE seconds past its time limit, it is
+    restarted and the search runs again.
+    """
+
+    def __init__(self, command=None, time_limit=UCI_TIME_LIMIT, node_limit=None, max_depth=None,
+                 options=None):
+        if command is None:
+            command = STAND_IN_COMMAND
+        elif isinstance(command, str):
+            command = shlex.split(command)
+        self.command = command
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.options = options or {}
+        self.transport = None
+        self.protocol = None
+        self.starts = 0
+        self.restarts = 0
+        self.game = object()  # A new object makes python-chess send ucinewgame
+        self.lock = threading.Lock()  # One search at a time on the one process
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="uci-engine", daemon=True)
+        self.thread.start()
+        # Start now, so the first move doesn't wait for the engine to load
+        self.run(self.open_engine())
+
+    def run(self, coroutine):
+        """Run a coroutine on the engine's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    @property
+    def alive(self):
+        return self.protocol is not None and not self.protocol.returncode.done()
+
+    async def open_engine(self):
+        self.transport, self.protocol = await chess.engine.popen_uci(self.command)
+        if self.options:
+            await self.protocol.configure(self.options)
+        self.starts += 1
+
+    async def close_engine(self):
+        if self.protocol is None:
+            return
+        try:
+            await asyncio.wait_for(self.protocol.quit(), HANG_GRACE)
+        except (chess.engine.EngineError, asyncio.TimeoutError):
+            pass
+        if not self.protocol.returncode.done():
+            self.transport.kill()
+        self.transport = None
+        self.protocol = None
+
+    async def restart_engine(self):
+        if self.transport is not None and not self.protocol.returncode.done():
+            self.transport.kill()
+        self.transport = None
+        self.protocol = None
+        self.restarts += 1
+        await self.open_engine()
+
+    def close(self):
+        """Quit the engine process and stop the event loop."""
+        self.run(self.close_engine())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def new_game(self):
+        """Tell the engine the next position starts a new game."""
+        self.game = object()
+
+    def search(self, board, time_limit=None, node_limit=None, max_depth=None,
+               stop_event=None, ponder_hit=None):
+        """Search board with the engine and return a SearchResult for the side to move.
+
+        Like SearchEngine.search(), setting stop_event aborts the search,
+        and passing ponder_hit makes it a ponder search that runs
+        unlimited until the event is set, then stops once the time limit
+        has passed since the search started.
+        """
+        time_limit = self.time_limit if time_limit is None else time_limit
+        node_limit = self.node_limit if node_limit is None else node_limit
+        max_depth = self.max_depth if max_depth is None else max_depth
+        if not any(board.generate_legal_moves()):
+            return SearchResult(None, 0, 0, 0, 0.0, [])
+        with self.lock:
+            for attempt in range(MAX_ATTEMPTS):
+                try:
+                    return self.run(self.analyse(board.copy(), time_limit, node_limit, max_depth,
+                                                 stop_event, ponder_hit))
+                except (chess.engine.EngineError, asyncio.TimeoutError):
+                    if attempt == MAX_ATTEMPTS - 1:
+                        raise
+                    self.run(self.restart_engine())
+
+    async def analyse(self, board, time_limit, node_limit, max_depth, stop_event, ponder_hit):
+        if not self.alive:
+            # It died between searches
+            await self.restart_engine()
+        start = time.perf_counter()
+        if ponder_hit is None:
+            limit = chess.engine.Limit(time=time_limit or None, nodes=node_limit, depth=max_depth)
+        else:
+            limit = None  # "go infinite" until the ponder hit
+        deadline = start + time_limit + HANG_GRACE if time_limit and ponder_hit is None else None
+
+        analysis = await self.protocol.analysis(board, limit, game=self.game)
+        finished = asyncio.ensure_future(analysis.wait())
+        stopped = False
+        while not finished.done():
+            await asyncio.wait({finished}, timeout=POLL_INTERVAL)
+            now = time.perf_counter()
+            if not stopped and not finished.done() and self.should_stop(
+                    analysis, start, now, time_limit, max_depth, stop_event, ponder_hit):
+                analysis.stop()
+                stopped = True
+                deadline = now + HANG_GRACE
+            if deadline is not None and now > deadline and not finished.done():
+                finished.cancel()
+                raise asyncio.TimeoutError(f"{self.command[0]} did not answer in time")
+        best = finished.result()  # Raises EngineTerminatedError if the process died
+
+        info = analysis.info
+        move = best.move
+        pv = info.get("pv") or []
+        if not pv or pv[0] != move:
+            pv = [move] if move else []
+        score = info["score"].pov(board.turn).score(mate_score=MATE_SCORE) if "score" in info else 0
+        return SearchResult(move, score, info.get("depth", 0), info.get("nodes", 0),
+                            time.perf_counter() - start, pv, source="uci")
+
+    def should_stop(self, analysis, start, now, time_limit, max_depth, stop_event, ponder_hit):
+        if stop_event is not None and stop_event.is_set():
+            return True
+        if ponder_hit is None or not ponder_hit.is_set():
+            return False
+        # A ponder hit: apply the limits the engine wasn't given
+        if time_limit and now - start >= time_limit:
+            return True
+        return max_depth is not None and analysis.info.get("depth", 0) >= max_depth
+
+
+def parse_position(tokens):
+    """Return the board described by the arguments of a UCI position command."""
+    if tokens[0] == 'startpos':
+        board = chess.Board()
+        rest = tokens[1:]
+    else:
+        end = tokens.index('moves') if 'moves' in tokens else len(tokens)
+        board = chess.Board(' '.join(tokens[1:end]))
+        rest = tokens[end:]
+    if rest and rest[0] == 'moves':
+        for move in rest[1:]:
+            board.push_uci(move)
+    return board
+
+
+def parse_go(tokens, turn, default_time=UCI_TIME_LIMIT):
+    """Return (time limit, node limit, max depth) from the arguments of a UCI go command.
+
+    A go command without any limit thinks for default_time seconds.
+    """
+    values = {}
+    for name, value in zip(tokens, tokens[1:]):
+        if value.lstrip('-').isdigit():
+            values[name] = int(value)
+    if 'infinite' in tokens:
+        return 0, None, MAX_PLY
+    time_limit = default_time
+    if 'movetime' in values:
+        time_limit = values['movetime'] / 1000
+    elif ('wtime' if turn == chess.WHITE else 'btime') in values:
+        # A simple clock budget: a thirtieth of the remaining time plus the increment
+        remaining = values['wtime' if turn == chess.WHITE else 'btime']
+        increment = values.get('winc' if turn == chess.WHITE else 'binc', 0)
+        time_limit = max(0.01, (remaining / 30 + increment * 0.8) / 1000)
+    elif 'depth' in values or 'nodes' in values:
+        time_limit = 0
+    return time_limit, values.get('nodes'), values.get('depth', MAX_PLY)
+
+
+def serve(time_limit=UCI_TIME_LIMIT, crash_after=None):
+    """Play SearchEngine over UCI on stdin/stdout.
+
+    This is a stand-in for a real engine binary, so the UCI backend can
+    be run anywhere. crash_after makes the process exit abruptly during
+    that many-th search, to try out the restart logic.
+    """
+    engine = SearchEngine(time_limit=time_limit)
+    board = chess.Board()
+    output = threading.Lock()
+    thread = None
+    stop_event = threading.Event()
+    searches = 0
+
+    def send(line):
+        with output:
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+
+    def think(board, limits, stop_event):
+        result = engine.search(board, *limits, stop_event=stop_event)
+        if result.move is None:
+            send("bestmove (none)")
+            return
+        score = (f"mate {(MATE_SCORE - abs(result.score) + 1) // 2 * (1 if result.score > 0 else -1)}"
+                 if abs(result.score) >= MATE_THRESHOLD else f"cp {result.score}")
+        send(f"info depth {result.depth} score {score} nodes {result.nodes} "
+             f"nps {result.nps} time {int(result.elapsed * 1000)} "
+             f"pv {' '.join(move.uci() for move in result.pv)}")
+        send(f"bestmove {result.move.uci()}")
+
+    def finish_search():
+        if thread is not None:
+            stop_event.set()
+            thread.join()
+
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == 'uci':
+            send("id name SearchEngine")
+            send("id author Chess Game")
+            send("uciok")
+        elif command == 'isready':
+            send("readyok")
+        elif command == 'ucinewgame':
+            finish_search()
+            engine.new_game()
+        elif command == 'position':
+            board = parse_position(tokens[1:])
+        elif command == 'go':
+            finish_search()
+            searches += 1
+            if crash_after is not None and searches >= crash_after:
+                os._exit(1)
+            stop_event = threading.Event()
+            limits = parse_go(tokens[1:], board.turn, time_limit)
+            thread = threading.Thread(target=think, daemon=True,
+                                      args=(board.copy(), limits, stop_event))
+            thread.start()
+        elif command == 'stop':
+            finish_search()
+        elif command == 'quit':
+            break
+    finish_search()
+
+
+def benchmark(command=None, moves=10, time_limit=0.05):
+    """Compare per-move latency of the persistent backend with spawning an engine per move.
+
+    Also kills the engine process once to time the restart. Returns
+    latencies in milliseconds.
+    """
+    command = command or STAND_IN_COMMAND
+    board = chess.Board()
+    limit = chess.engine.Limit(time=time_limit)
+
+    spawned = []
+    for _ in range(moves):
+        start = time.perf_counter()
+        engine = chess.engine.SimpleEngine.popen_uci(command)
+        engine.play(board, limit)
+        engine.quit()
+        spawned.append(time.perf_counter() - start)
+
+    uci = UCIEngine(command, time_limit=time_limit)
+    persistent = []
+    for _ in range(moves):
+        start = time.perf_counter()
+        uci.search(board)
+        persistent.append(time.perf_counter() - start)
+
+    uci.transport.kill()
+    start = time.perf_counter()
+    result = uci.search(board)
+    recovered = time.perf_counter() - start
+    restarts = uci.restarts
+    uci.close()
+    return {
+        "spawn_ms": 1e3 * statistics.median(spawned),
+        "persistent_ms": 1e3 * statistics.median(persistent),
+        "overhead_ms": 1e3 * (statistics.median(persistent) - time_limit),
+        "restart_ms": 1e3 * recovered,
+        "restarts": restarts,
+        "recovered": result.move is not None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the UCI stand-in engine or benchmark the UCI backend.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="speak UCI on stdin/stdout with the built-in engine")
+    serve_parser.add_argument("--time", type=float, default=UCI_TIME_LIMIT,
+                              help="think time when go gives no limit (default %(default)s s)")
+    serve_parser.add_argument("--crash-after", type=int, metavar="N",
+                              help="exit abruptly on the Nth search, to test restarts")
+
+    bench = commands.add_parser("bench", help="time the persistent backend against an engine per move")
+    bench.add_argument("--engine", help="UCI engine command (default: the built-in stand-in)")
+    bench.add_argument("-m", "--moves", type=int, default=10)
+    bench.add_argument("--time", type=float, default=0.05, help="think time per move (default %(default)s s)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.time, args.crash_after)
+        return
+
+    results = benchmark(shlex.split(args.engine) if args.engine else None, args.moves, args.time)
+    print(f"Engine per move:    {results['spawn_ms']:.0f} ms per move (median)")
+    print(f"Persistent engine:  {results['persistent_ms']:.0f} ms per move, "
+          f"{results['overhead_ms']:.1f} ms over the think time")
+    print(f"Killed the engine:  restarted and answered in {results['restart_ms']:.0f} ms "
+          f"({results['restarts']} restart{'s' if results['restarts'] != 1 else ''}, "
+          f"{'ok' if results['recovered'] else 'FAILED'})")
+
+if __name__ == "__main__":
+    main()